@@ -0,0 +1,159 @@
+"""
+Throughput and tail latency of MainHTTPHandler backed by RedisStore talking to RespServer,
+the Redis stand-in injecting latency and faults, for every fault profile.
+
+    poetry run python -m benchmarks.http_load --duration 10 --clients 16
+"""
+
+import argparse
+import datetime
+import hashlib
+import http.client
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer
+
+from homework_05 import api
+from homework_05.health import HealthMonitor
+from benchmarks.resp_server import FAULT_PROFILES, RespServer
+from homework_05.scoring import set_interests
+from homework_05.store import RedisStore
+
+ACCOUNT = "horns&hoofs"
+LOGIN = "h&f"
+CLIENTS = 1000
+INTERESTS = ["cars", "pets", "travel", "hi-tech", "sport", "music", "books", "tv"]
+
+
+class BenchmarkHTTPHandler(api.MainHTTPHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def make_request(rnd: random.Random) -> dict:
+    request: dict = {
+        "account": ACCOUNT,
+        "login": LOGIN,
+        "token": hashlib.sha512((ACCOUNT + LOGIN + api.SALT).encode()).hexdigest(),
+    }
+    if rnd.random() < 0.5:
+        request["method"] = "online_score"
+        request["arguments"] = {
+            "phone": f"7{rnd.randrange(10**10):010d}",
+            "email": "stupnikov@otus.ru",
+            "first_name": rnd.choice(["a", "b", "c"]),
+            "last_name": "d",
+        }
+    else:
+        request["method"] = "clients_interests"
+        request["arguments"] = {
+            "client_ids": rnd.sample(range(CLIENTS), 20),
+            "date": "19.07.2017",
+        }
+    return request
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def run_client(port: int, deadline: float, seed: int, latencies: list, codes: Counter):
+    rnd = random.Random(seed)
+    connection = http.client.HTTPConnection("localhost", port, timeout=30)
+    while time.monotonic() < deadline:
+        # Bytes body is sent with headers in one packet, str would hit delayed ACK
+        body = json.dumps(make_request(rnd)).encode("utf-8")
+        started = time.perf_counter()
+        try:
+            connection.request("POST", "/method/", body)
+            response = connection.getresponse()
+            response.read()
+            code = str(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            code = type(e).__name__
+            connection.close()
+        latencies.append(time.perf_counter() - started)
+        codes[code] += 1
+    connection.close()
+
+
+def run_profile(name: str, duration: float, clients: int, seed: int) -> dict:
+    redis_server = RespServer(("localhost", 0), FAULT_PROFILES[name], seed=seed)
+    threading.Thread(target=redis_server.serve_forever, daemon=True).start()
+    store = RedisStore("localhost", redis_server.server_address[1])
+    for cid in range(CLIENTS):
+        set_interests(store, cid, INTERESTS[: cid % 5 + 1], datetime.date(2017, 7, 19))
+    redis_server.faults.clear()
+
+    health = HealthMonitor(store, interval=0.5)
+    health.start()
+    BenchmarkHTTPHandler.store = store
+    BenchmarkHTTPHandler.health = health
+    http_server = ThreadingHTTPServer(("localhost", 0), BenchmarkHTTPHandler)
+    http_server.daemon_threads = True
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+
+    latencies: list[float] = []
+    codes: Counter[str] = Counter()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(http_server.server_address[1], deadline, seed + i, latencies, codes),
+        )
+        for i in range(clients)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    http_server.shutdown()
+    http_server.server_close()
+    health.stop()
+    redis_server.shutdown()
+    redis_server.server_close()
+
+    latencies.sort()
+    return {
+        "profile": name,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000 if latencies else 0.0, 2),
+        "codes": dict(codes),
+        "faults": dict(redis_server.faults),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-p",
+        "--profile",
+        action="append",
+        choices=sorted(FAULT_PROFILES),
+        help="Fault profile to run, all profiles by default",
+    )
+    parser.add_argument("-d", "--duration", type=float, default=10.0)
+    parser.add_argument("-c", "--clients", type=int, default=16)
+    parser.add_argument("-s", "--seed", type=int, default=42)
+    args = parser.parse_args()
+    # Injected faults are logged by the store on every request
+    logging.basicConfig(level=logging.CRITICAL)
+
+    for name in args.profile or FAULT_PROFILES:
+        print(json.dumps(run_profile(name, args.duration, args.clients, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+import fnmatch
+import hashlib
+import json
+import random
+import socketserver
+import threading
+import time
+from collections import Counter
+from io import BufferedIOBase
+from typing import Any, Callable
+
+from homework_05.store import CACHE_GET_OR_SET_SCRIPT, MGET_JSON_SCRIPT
+
+# Returns delay in seconds
+Latency = Callable[[random.Random], float]
+
+# Connection setup commands are never delayed or failed, faults hit the data path
+FAULTLESS_COMMANDS = {b"AUTH", b"CLIENT", b"HELLO", b"SELECT"}
+MAX_BULK_SIZE = 512 * 1024 * 1024
+
+
+def constant(ms: float) -> Latency:
+    return lambda rnd: ms / 1000
+
+
+def uniform(low_ms: float, high_ms: float) -> Latency:
+    return lambda rnd: rnd.uniform(low_ms, high_ms) / 1000
+
+
+def lognormal(median_ms: float, sigma: float) -> Latency:
+    """
+    Long-tailed latency: half of commands are faster than median, p99 is median * e^(2.33 sigma).
+    """
+    return lambda rnd: median_ms * rnd.lognormvariate(0, sigma) / 1000
+
+
+class FaultProfile:
+    """
+    What RespServer injects into every data command: latency drawn from a distribution
+    (per command or default) and, with given rates, one of the faults:
+    - drop: connection is closed instead of reply;
+    - busy: LOADING error reply, like Redis loading a dataset after restart;
+    - timeout: no reply for `hang` seconds, then connection is closed.
+    """
+
+    def __init__(
+        self,
+        latency: Latency | None = None,
+        command_latency: dict[str, Latency] | None = None,
+        drop_rate: float = 0.0,
+        busy_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        hang: float = 5.0,
+    ):
+        self.latency = latency
+        self.command_latency = {
+            name.upper().encode("ascii"): value
+            for name, value in (command_latency or {}).items()
+        }
+        self.drop_rate = drop_rate
+        self.busy_rate = busy_rate
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+
+    def delay(self, command: bytes, rnd: random.Random) -> float:
+        latency = self.command_latency.get(command, self.latency)
+        return latency(rnd) if latency is not None else 0.0
+
+    def fault(self, rnd: random.Random) -> str | None:
+        roll = rnd.random()
+        for fault, rate in (
+            ("drop", self.drop_rate),
+            ("busy", self.busy_rate),
+            ("timeout", self.timeout_rate),
+        ):
+            if roll < rate:
+                return fault
+            roll -= rate
+        return None
+
+
+FAULT_PROFILES = {
+    "healthy": FaultProfile(),
+    "latency": FaultProfile(latency=lognormal(1.0, 0.5)),
+    "long-tail": FaultProfile(latency=lognormal(1.0, 1.5)),
+    "slow-scripts": FaultProfile(
+        latency=constant(0.2), command_latency={"EVALSHA": uniform(5.0, 50.0)}
+    ),
+    "drops": FaultProfile(latency=constant(0.2), drop_rate=0.01),
+    "loading": FaultProfile(latency=constant(0.2), busy_rate=0.05),
+    "timeouts": FaultProfile(latency=constant(0.2), timeout_rate=0.005, hang=2.0),
+}
+
+
+class CommandError(Exception):
+    def __init__(self, message: str, prefix: str = "ERR"):
+        super().__init__(message)
+        self.prefix = prefix
+
+
+class Status(str):
+    """
+    Simple string reply, e.g. OK.
+    """
+
+
+def read_command(rfile: BufferedIOBase) -> list[bytes] | None:
+    """
+    Read command sent as RESP array of bulk strings.
+    :return: Command and its arguments or None if connection is closed
+    """
+    line = rfile.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        raise CommandError("Protocol error: expected '*'")
+    args = []
+    for _ in range(int(line[1:])):
+        header = rfile.readline()
+        if not header.startswith(b"$"):
+            raise CommandError("Protocol error: expected '$'")
+        size = int(header[1:])
+        if not 0 <= size <= MAX_BULK_SIZE:
+            raise CommandError("Protocol error: invalid bulk length")
+        data = rfile.read(size + 2)
+        if len(data) != size + 2:
+            return None
+        args.append(data[:-2])
+    return args
+
+
+def encode(reply: Any) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, CommandError):
+        return f"-{reply.prefix} {reply}\r\n".encode("utf-8")
+    if isinstance(reply, Status):
+        return f"+{reply}\r\n".encode("utf-8")
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, str):
+        reply = reply.encode("utf-8")
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%b\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(encode(item) for item in reply)
+
+
+def script_sha(script: str | bytes) -> bytes:
+    data = script.encode("utf-8") if isinstance(script, str) else script
+    return hashlib.sha1(data).hexdigest().encode("ascii")
+
+
+class Keyspace:
+    """
+    Thread-safe string keys with expiration.
+    """
+
+    def __init__(self):
+        self.__values: dict[bytes, tuple[bytes, float | None]] = {}
+        self.__lock = threading.Lock()
+
+    def __live(self, key: bytes) -> tuple[bytes, float | None] | None:
+        entry = self.__values.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.__values[key]
+            return None
+        return entry
+
+    def get(self, key: bytes) -> bytes | None:
+        with self.__lock:
+            entry = self.__live(key)
+            return entry[0] if entry else None
+
+    def set(self, key: bytes, value: bytes, ttl: float | None = None):
+        with self.__lock:
+            expires_at = time.monotonic() + ttl if ttl is not None else None
+            self.__values[key] = (value, expires_at)
+
+    def delete(self, keys: list[bytes]) -> int:
+        deleted = 0
+        with self.__lock:
+            for key in keys:
+                if self.__live(key) is not None:
+                    del self.__values[key]
+                    deleted += 1
+        return deleted
+
+    def incr(self, key: bytes, amount: int = 1) -> int:
+        with self.__lock:
+            entry = self.__live(key)
+            try:
+                value = (int(entry[0]) if entry else 0) + amount
+            except ValueError:
+                raise CommandError("value is not an integer or out of range")
+            self.__values[key] = (b"%d" % value, entry[1] if entry else None)
+            return value
+
+    def expire(self, key: bytes, ttl: float) -> int:
+        with self.__lock:
+            entry = self.__live(key)
+            if entry is None:
+                return 0
+            self.__values[key] = (entry[0], time.monotonic() + ttl)
+            return 1
+
+    def pttl(self, key: bytes) -> int:
+        with self.__lock:
+            entry = self.__live(key)
+            if entry is None:
+                return -2
+            if entry[1] is None:
+                return -1
+            return int((entry[1] - time.monotonic()) * 1000)
+
+    def keys(self, pattern: bytes) -> list[bytes]:
+        with self.__lock:
+            return [
+                key
+                for key in list(self.__values)
+                if self.__live(key) is not None and fnmatch.fnmatchcase(key, pattern)
+            ]
+
+    def flush(self):
+        with self.__lock:
+            self.__values.clear()
+
+
+class RespRequestHandler(socketserver.StreamRequestHandler):
+    server: "RespServer"
+
+    def handle(self):
+        while True:
+            try:
+                command = read_command(self.rfile)
+            except (CommandError, ValueError, OSError):
+                return
+            if not command:
+                return
+            name = command[0].upper()
+            if name not in FAULTLESS_COMMANDS:
+                profile = self.server.profile
+                delay = profile.delay(name, self.server.random)
+                fault = profile.fault(self.server.random)
+                if delay:
+                    time.sleep(delay)
+                if fault is not None:
+                    self.server.faults[fault] += 1
+                if fault == "drop":
+                    return
+                if fault == "timeout":
+                    time.sleep(profile.hang)
+                    return
+                if fault == "busy":
+                    reply: Any = CommandError(
+                        "Redis is loading the dataset in memory", "LOADING"
+                    )
+                    self.wfile.write(encode(reply))
+                    continue
+            try:
+                reply = self.server.execute(name, command[1:])
+            except CommandError as e:
+                reply = e
+            except (ValueError, IndexError):
+                reply = CommandError(f"syntax error in '{name.decode()}' command")
+            try:
+                self.wfile.write(encode(reply))
+            except OSError:
+                return
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    """
+    Pure-Python stand-in for Redis speaking RESP2, for performance and fault tolerance tests.
+    Implements commands RedisStore and RedisRateLimiter use: PING, GET, SET (EX/PX), MGET,
+    DEL, INCR(BY), EXPIRE, PTTL, SCAN, FLUSHALL and scripts registered by RedisStore
+    (EVALSHA, EVAL, SCRIPT LOAD/EXISTS/FLUSH), which are executed natively.
+    Pipelines need nothing special: commands are answered in order. Client side caching
+    (CLIENT TRACKING) isn't supported, so RedisStore local cache stays disabled.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        server_address: tuple[str, int],
+        profile: FaultProfile | None = None,
+        seed: int | None = None,
+    ):
+        self.profile = profile or FaultProfile()
+        self.random = random.Random(seed)
+        self.keyspace = Keyspace()
+        self.faults: Counter[str] = Counter()
+        self.scripts: dict[bytes, Callable[[list[bytes], list[bytes]], Any]] = {
+            script_sha(CACHE_GET_OR_SET_SCRIPT): self.cache_get_or_set,
+            script_sha(MGET_JSON_SCRIPT): self.mget_json,
+        }
+        self.loaded_scripts: set[bytes] = set()
+        self.__client_ids = iter(range(1, 2**63))
+        super().__init__(server_address, RespRequestHandler)
+
+    def cache_get_or_set(self, keys: list[bytes], args: list[bytes]) -> bytes | None:
+        value = self.keyspace.get(keys[0])
+        if value is not None:
+            ttl = self.keyspace.pttl(keys[0])
+            if ttl < 0 or ttl > int(args[2]):
+                return value
+        self.keyspace.set(keys[0], args[0], int(args[1]))
+        return None
+
+    def mget_json(self, keys: list[bytes], args: list[bytes]) -> bytes:
+        parts = []
+        for key, name in zip(keys, args[1:]):
+            value = self.keyspace.get(key)
+            name_json = json.dumps(name.decode("utf-8")).encode("utf-8")
+            parts.append(name_json + b":" + (value or args[0]))
+        return b"{" + b",".join(parts) + b"}"
+
+    def eval(self, sha: bytes, args: list[bytes]) -> Any:
+        script = self.scripts.get(sha)
+        if script is None or sha not in self.loaded_scripts:
+            raise CommandError("No matching script. Please use EVAL.", "NOSCRIPT")
+        numkeys = int(args[0])
+        return script(args[1 : numkeys + 1], args[numkeys + 1 :])
+
+    def load_script(self, body: bytes) -> bytes:
+        sha = script_sha(body)
+        if sha not in self.scripts:
+            raise CommandError("only scripts registered by RedisStore are supported")
+        self.loaded_scripts.add(sha)
+        return sha
+
+    def execute(self, name: bytes, args: list[bytes]) -> Any:
+        keyspace = self.keyspace
+        match name:
+            case b"PING":
+                return Status("PONG") if not args else args[0]
+            case b"GET":
+                return keyspace.get(args[0])
+            case b"MGET":
+                return [keyspace.get(key) for key in args]
+            case b"SET":
+                ttl = None
+                options = [arg.upper() for arg in args[2:]]
+                if b"EX" in options:
+                    ttl = float(args[2 + options.index(b"EX") + 1])
+                elif b"PX" in options:
+                    ttl = float(args[2 + options.index(b"PX") + 1]) / 1000
+                keyspace.set(args[0], args[1], ttl)
+                return Status("OK")
+            case b"DEL":
+                return keyspace.delete(args)
+            case b"INCR":
+                return keyspace.incr(args[0])
+            case b"INCRBY":
+                return keyspace.incr(args[0], int(args[1]))
+            case b"EXPIRE":
+                return keyspace.expire(args[0], float(args[1]))
+            case b"PTTL":
+                return keyspace.pttl(args[0])
+            case b"SCAN":
+                # Whole keyspace is returned in one iteration
+                options = [arg.upper() for arg in args]
+                pattern = b"*"
+                if b"MATCH" in options:
+                    pattern = args[options.index(b"MATCH") + 1]
+                return [b"0", keyspace.keys(pattern)]
+            case b"FLUSHALL" | b"FLUSHDB":
+                keyspace.flush()
+                return Status("OK")
+            case b"EVALSHA":
+                return self.eval(args[0].lower(), args[1:])
+            case b"EVAL":
+                return self.eval(self.load_script(args[0]), args[1:])
+            case b"SCRIPT":
+                match args[0].upper():
+                    case b"LOAD":
+                        return self.load_script(args[1])
+                    case b"EXISTS":
+                        return [
+                            int(sha.lower() in self.loaded_scripts) for sha in args[1:]
+                        ]
+                    case b"FLUSH":
+                        self.loaded_scripts.clear()
+                        return Status("OK")
+            case b"CLIENT":
+                match args[0].upper():
+                    case b"ID":
+                        return next(self.__client_ids)
+                    case b"SETINFO" | b"SETNAME":
+                        return Status("OK")
+            case b"AUTH" | b"SELECT":
+                return Status("OK")
+        raise CommandError(f"unknown command '{name.decode('utf-8', 'replace')}'")
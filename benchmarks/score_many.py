@@ -0,0 +1,68 @@
+"""
+Per-row cost of batch scoring: pure Python, numpy with list columns and numpy with
+array columns. numpy rows are skipped unless it's installed (poetry install -E numpy).
+
+    poetry run python -m benchmarks.score_many
+"""
+
+import argparse
+import datetime
+import random
+import timeit
+from typing import Any
+from unittest import mock
+
+from homework_05 import scoring
+from homework_05.scoring import score_many
+
+
+def make_columns(rows: int, seed: int) -> list[list]:
+    rnd = random.Random(seed)
+    return [
+        [rnd.choice([None, "", "79175002040"]) for _ in range(rows)],
+        [rnd.choice([None, "stupnikov@otus.ru"]) for _ in range(rows)],
+        [rnd.choice([None, datetime.date(1990, 1, 1)]) for _ in range(rows)],
+        [rnd.choice([None, 0, 1, 2]) for _ in range(rows)],
+        [rnd.choice([None, "", "a"]) for _ in range(rows)],
+        [rnd.choice([None, "b"]) for _ in range(rows)],
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--rows", type=int, default=100_000)
+    parser.add_argument("-n", "--number", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("-s", "--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    columns = make_columns(args.rows, args.seed)
+    runs: dict[str, tuple[Any, list]] = {"python": (None, columns)}
+    if scoring.numpy is not None:
+        numpy = scoring.numpy
+        runs["numpy lists"] = (numpy, columns)
+        runs["numpy arrays"] = (
+            numpy,
+            [
+                numpy.array([value or "" for value in column])
+                if isinstance(next(filter(None, column), None), str)
+                else numpy.array(column, dtype=object)
+                for column in columns
+            ],
+        )
+
+    print(f"{'path':>12} {'ns/row':>8}")
+    for name, (numpy, run_columns) in runs.items():
+        with mock.patch.object(scoring, "numpy", numpy):
+            best = min(
+                timeit.repeat(
+                    lambda: score_many(*run_columns),
+                    number=args.number,
+                    repeat=args.repeat,
+                )
+            )
+        print(f"{name:>12} {best / args.number / args.rows * 1e9:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
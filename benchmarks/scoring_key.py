@@ -0,0 +1,41 @@
+"""
+Per-call cost and size of score cache keys of every version.
+
+    poetry run python -m benchmarks.scoring_key
+"""
+
+import argparse
+import datetime
+import timeit
+
+from homework_05.scoring import SCORING_KEYS
+
+IDENTITIES = [
+    ("Стансилав", "Ступников", "79175002040", datetime.date(1990, 1, 1)),
+    ("John", "Dow", None, None),
+    (None, None, "79213333333", datetime.date(1999, 12, 31)),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--number", type=int, default=100_000)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'version':>7} {'ns/call':>8} {'key bytes':>9}")
+    for version, scoring_key in SCORING_KEYS.items():
+        best = min(
+            timeit.repeat(
+                lambda: [scoring_key(*identity) for identity in IDENTITIES],
+                number=args.number,
+                repeat=args.repeat,
+            )
+        )
+        per_call = best / args.number / len(IDENTITIES) * 1e9
+        key_size = len(scoring_key(*IDENTITIES[0]).encode("utf-8"))
+        print(f"{version:>7} {per_call:>8.0f} {key_size:>9}")
+
+
+if __name__ == "__main__":
+    main()
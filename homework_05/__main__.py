@@ -1,10 +1,33 @@
+import datetime
 import logging
-from http.server import HTTPServer
+import os
+import threading
+from http.server import ThreadingHTTPServer
 
 import argparse
 
+import redis
+
+from homework_05.admission import AdmissionController, RateLimiter, RedisRateLimiter
 from homework_05.api import MainHTTPHandler
-from homework_05.store import RedisStore
+from homework_05.binary import BinaryServer
+from homework_05.health import HealthMonitor
+from homework_05.hotkeys import HotKeyStore
+from homework_05.hotkeys import tracker as hot_keys
+from homework_05.local_cache import LocalCache, SnapshotWriter
+from homework_05 import scoring
+from homework_05.scoring import compact_interests
+from homework_05.shm_cache import SharedCacheStore, SharedMemoryCache
+from homework_05.store import RedisStore, Store
+from homework_05.tracing import tracer
+
+
+def redis_endpoint(value: str) -> tuple[str, int]:
+    host, _, port = value.rpartition(":")
+    if not host:
+        return value, 6379
+    return host, int(port)
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -14,6 +37,140 @@ if __name__ == "__main__":
         "-rh", "--redis-host", action="store", type=str, default="localhost"
     )
     parser.add_argument("-rp", "--redis-port", action="store", type=int, default=6379)
+    parser.add_argument(
+        "-rr",
+        "--redis-replica",
+        action="append",
+        type=redis_endpoint,
+        default=[],
+        help="Read replica as host:port, may be repeated",
+    )
+    parser.add_argument(
+        "--local-cache-size",
+        action="store",
+        type=int,
+        default=0,
+        help="Size of process-local cache kept coherent by Redis client tracking",
+    )
+    parser.add_argument("--local-cache-ttl", action="store", type=float, default=300.0)
+    parser.add_argument(
+        "--local-cache-snapshot",
+        action="store",
+        default=None,
+        help="File to snapshot local cache to and warm it from at startup",
+    )
+    parser.add_argument(
+        "--local-cache-snapshot-interval", action="store", type=float, default=30.0
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        action="store",
+        type=int,
+        default=1,
+        help="Number of pre-forked worker processes",
+    )
+    parser.add_argument(
+        "--shared-cache",
+        action="store",
+        default=None,
+        help="Memory-mapped cache file shared by workers, e.g. /dev/shm/homework_05.cache. "
+        "Entries only expire by TTL, they aren't invalidated on Redis changes",
+    )
+    parser.add_argument(
+        "--shared-cache-slots", action="store", type=int, default=65_536
+    )
+    parser.add_argument("--shared-cache-ttl", action="store", type=int, default=60)
+    parser.add_argument(
+        "--binary-port",
+        action="store",
+        type=int,
+        default=0,
+        help="Port of framed binary protocol listener for internal callers",
+    )
+    parser.add_argument(
+        "--no-compression",
+        action="store_true",
+        help="Disable response compression negotiated by Accept-Encoding",
+    )
+    parser.add_argument(
+        "--compression-min-size",
+        action="store",
+        type=int,
+        default=1024,
+        help="Responses smaller than this number of bytes are not compressed",
+    )
+    parser.add_argument("--compression-level", action="store", type=int, default=6)
+    parser.add_argument(
+        "--health-interval",
+        action="store",
+        type=float,
+        default=1.0,
+        help="Interval of background store health checks",
+    )
+    parser.add_argument(
+        "--hot-keys",
+        action="store_true",
+        help="Track most accessed store keys, exported by admin 'hotkeys' method",
+    )
+    parser.add_argument(
+        "--pin-hot-keys",
+        action="store_true",
+        help="Keep tracked hot keys in local cache regardless of LRU eviction",
+    )
+    parser.add_argument(
+        "--max-inflight",
+        action="store",
+        type=int,
+        default=0,
+        help="Limit of concurrently processed requests, excess is rejected with 503",
+    )
+    parser.add_argument(
+        "--queue-target-ms",
+        action="store",
+        type=float,
+        default=50.0,
+        help="Target queue delay for load shedding",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        action="store",
+        type=float,
+        default=0.0,
+        help="Requests per second allowed for each account/login in this process",
+    )
+    parser.add_argument("--rate-burst", action="store", type=float, default=None)
+    parser.add_argument(
+        "--global-rate-limit",
+        action="store",
+        type=float,
+        default=0.0,
+        help="Requests per second allowed for each account/login, shared through Redis",
+    )
+    parser.add_argument(
+        "--scoring-key-version",
+        action="store",
+        type=int,
+        choices=sorted(scoring.SCORING_KEYS),
+        default=scoring.SCORING_KEY_VERSION,
+        help="Version of score cache keys, old version is kept for migration",
+    )
+    parser.add_argument(
+        "--no-undated-interests",
+        action="store_true",
+        help="Don't read undated interests of clients never written by day, "
+        "once the migration to daily partitions is over",
+    )
+    parser.add_argument(
+        "--compact-interests",
+        action="store_true",
+        help="Roll daily interests of past months into monthly blobs and exit",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="Collect per-request stage spans, exported by admin 'trace' method",
+    )
     args = parser.parse_args()
     logging.basicConfig(
         filename=args.log,
@@ -26,12 +183,100 @@ if __name__ == "__main__":
         args.redis_host,
         args.redis_port,
     )
-    MainHTTPHandler.store = RedisStore(args.redis_host, args.redis_port)
-    server = HTTPServer(("localhost", args.port), MainHTTPHandler)
-    logging.info("Starting server at %s" % args.port)
+    if args.redis_replica:
+        logging.info("RedisStore reads are routed to replicas %s", args.redis_replica)
+    if args.compact_interests:
+        compacted = compact_interests(
+            RedisStore(args.redis_host, args.redis_port), datetime.date.today()
+        )
+        logging.info("Compacted %d daily interests partitions", compacted)
+        raise SystemExit(0)
+    # Workers share listening socket, everything else including background threads
+    # is created after fork
+    server = ThreadingHTTPServer(("localhost", args.port), MainHTTPHandler)
+    binary_server = None
+    if args.binary_port:
+        binary_server = BinaryServer(("localhost", args.binary_port))
+    workers: list[int] = []
+    worker = 0
+    for i in range(1, args.workers):
+        pid = os.fork()
+        if pid == 0:
+            workers = []
+            worker = i
+            break
+        workers.append(pid)
+
+    local_cache = None
+    snapshot_writer = None
+    snapshot = args.local_cache_snapshot
+    if snapshot and args.workers > 1:
+        # Every worker has its own local cache
+        snapshot = f"{snapshot}.{worker}"
+    if args.local_cache_size > 0:
+        local_cache = LocalCache(args.local_cache_size, args.local_cache_ttl)
+    redis_store = RedisStore(
+        args.redis_host,
+        args.redis_port,
+        replicas=args.redis_replica,
+        local_cache=local_cache,
+        local_cache_snapshot=snapshot,
+    )
+    if local_cache is not None and snapshot:
+        # Snapshot is restored once tracking is established, the cache is empty before
+        snapshot_writer = SnapshotWriter(
+            local_cache,
+            snapshot,
+            args.local_cache_snapshot_interval,
+            active=lambda: redis_store.local_cache_active,
+        )
+        snapshot_writer.start()
+    store: Store = redis_store
+    if args.shared_cache:
+        store = SharedCacheStore(
+            store,
+            SharedMemoryCache(args.shared_cache, args.shared_cache_slots),
+            args.shared_cache_ttl,
+        )
+    if args.hot_keys or args.pin_hot_keys:
+        store = HotKeyStore(store, hot_keys, local_cache if args.pin_hot_keys else None)
+    MainHTTPHandler.store = store
+    MainHTTPHandler.health = HealthMonitor(store, args.health_interval)
+    MainHTTPHandler.health.start()
+    if args.max_inflight > 0:
+        MainHTTPHandler.admission = AdmissionController(
+            args.max_inflight, target=args.queue_target_ms / 1000
+        )
+    rate_limiters: list[RateLimiter | RedisRateLimiter] = []
+    if args.rate_limit > 0:
+        rate_limiters.append(RateLimiter(args.rate_limit, args.rate_burst))
+    if args.global_rate_limit > 0:
+        rate_limiters.append(
+            RedisRateLimiter(
+                redis.Redis(args.redis_host, args.redis_port, socket_timeout=0.1),
+                args.global_rate_limit,
+            )
+        )
+    MainHTTPHandler.rate_limiters = rate_limiters
+    MainHTTPHandler.compression = not args.no_compression
+    MainHTTPHandler.compression_min_size = args.compression_min_size
+    MainHTTPHandler.compression_level = args.compression_level
+    tracer.enabled = args.trace
+    scoring.SCORING_KEY_VERSION = args.scoring_key_version
+    scoring.UNDATED_INTERESTS_FALLBACK = not args.no_undated_interests
+    if binary_server is not None:
+        logging.info("Starting binary protocol server at %s" % args.binary_port)
+        threading.Thread(target=binary_server.serve_forever, daemon=True).start()
+    logging.info("Starting server at %s, pid %d" % (args.port, os.getpid()))
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         pass
-    logging.info("Stopping server")
+    logging.info("Stopping server, pid %d" % os.getpid())
     server.server_close()
+    if snapshot_writer is not None:
+        snapshot_writer.stop()
+    if binary_server is not None:
+        binary_server.server_close()
+    for pid in workers:
+        os.waitpid(pid, 0)
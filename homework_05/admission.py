@@ -0,0 +1,144 @@
+import collections
+import logging
+import math
+import threading
+import time
+
+import redis
+
+logger = logging.getLogger()
+
+
+class AdmissionController:
+    """
+    Caps number of in-flight requests. Requests wait for a free slot at most `max_wait` seconds.
+    CoDel-style shedding: once queue delay stays above `target` for a whole `interval`,
+    requests are given only `target` seconds to get a slot, so the overload turns into
+    fast rejections instead of slow responses for everyone.
+    """
+
+    def __init__(
+        self,
+        max_inflight: int = 64,
+        target: float = 0.05,
+        interval: float = 0.5,
+        max_wait: float = 1.0,
+    ):
+        self.max_inflight = max_inflight
+        self.target = target
+        self.interval = interval
+        self.max_wait = max_wait
+        self.dropping = False
+        self.shed = 0
+        self.__slots = threading.BoundedSemaphore(max_inflight)
+        self.__lock = threading.Lock()
+        self.__above_target_until = 0.0
+
+    def acquire(self) -> bool:
+        started = time.monotonic()
+        acquired = self.__slots.acquire(
+            timeout=self.target if self.dropping else self.max_wait
+        )
+        now = time.monotonic()
+        delay = now - started
+        with self.__lock:
+            if acquired and delay < self.target:
+                self.__above_target_until = 0.0
+                self.dropping = False
+            elif not self.__above_target_until:
+                self.__above_target_until = now + self.interval
+            elif now >= self.__above_target_until:
+                self.dropping = True
+
+            if acquired and self.dropping and delay >= self.target:
+                self.__slots.release()
+                acquired = False
+            if not acquired:
+                self.shed += 1
+        return acquired
+
+    def release(self):
+        self.__slots.release()
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Take a token.
+        :return: 0 if token is taken, otherwise seconds until a token is available
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Per-key token bucket limits held in process memory. Least recently used buckets
+    are dropped above `max_keys`, a dropped key starts again with a full bucket.
+    """
+
+    def __init__(
+        self, rate: float, burst: float | None = None, max_keys: int = 100_000
+    ):
+        self.rate = rate
+        self.burst = burst or rate
+        self.max_keys = max_keys
+        self.__buckets: collections.OrderedDict[str, TokenBucket] = (
+            collections.OrderedDict()
+        )
+        self.__lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """
+        Account request of given key.
+        :param key: Client key
+        :return: 0 if request is allowed, otherwise seconds to retry after
+        """
+        with self.__lock:
+            bucket = self.__buckets.get(key)
+            if bucket is None:
+                bucket = self.__buckets[key] = TokenBucket(self.rate, self.burst)
+                if len(self.__buckets) > self.max_keys:
+                    self.__buckets.popitem(last=False)
+            else:
+                self.__buckets.move_to_end(key)
+            return bucket.take()
+
+
+class RedisRateLimiter:
+    """
+    Global per-key limit shared by all server processes: fixed window counters in Redis.
+    Fails open if Redis is unavailable.
+    """
+
+    def __init__(self, client: redis.Redis, rate: float, window: int = 1):
+        self.client = client
+        self.limit = math.ceil(rate * window)
+        self.window = window
+
+    def acquire(self, key: str) -> float:
+        now = time.time()
+        window = int(now // self.window)
+        counter = f"rl:{key}:{window}"
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.incr(counter)
+            pipe.expire(counter, self.window * 2)
+            count, _ = pipe.execute()
+        except Exception as e:
+            logger.error(f"Error on global rate limit check for key '{key}': {e}")
+            return 0.0
+        if count <= self.limit:
+            return 0.0
+        return (window + 1) * self.window - now
@@ -2,12 +2,24 @@ import json
 import datetime
 import logging
 import hashlib
+import math
 import uuid
+from collections.abc import Iterator
 
 from http.server import BaseHTTPRequestHandler
 
-from homework_05.scoring import get_interests, get_score
+from homework_05.admission import AdmissionController, RateLimiter, RedisRateLimiter
+from homework_05.compression import (
+    CompressionStats,
+    compressor,
+    decompress,
+    negotiate,
+)
+from homework_05.health import HealthMonitor
+from homework_05.hotkeys import tracker as hot_keys
+from homework_05.scoring import get_score, iter_interests
 from homework_05.store import Store
+from homework_05.tracing import ProfilerBusyError, profiler, request_id_var, tracer
 from homework_05.validation import (
     Validatable,
     ClientIDsField,
@@ -18,6 +30,7 @@ from homework_05.validation import (
     BirthDayField,
     GenderField,
     ArgumentsField,
+    PositiveIntField,
     GENDERS,
 )
 
@@ -28,15 +41,25 @@ OK = 200
 BAD_REQUEST = 400
 FORBIDDEN = 403
 NOT_FOUND = 404
+CONFLICT = 409
 INVALID_REQUEST = 422
+TOO_MANY_REQUESTS = 429
 INTERNAL_ERROR = 500
+SERVICE_UNAVAILABLE = 503
 ERRORS = {
     BAD_REQUEST: "Bad Request",
     FORBIDDEN: "Forbidden",
     NOT_FOUND: "Not Found",
+    CONFLICT: "Conflict",
     INVALID_REQUEST: "Invalid Request",
+    TOO_MANY_REQUESTS: "Too Many Requests",
     INTERNAL_ERROR: "Internal Server Error",
+    SERVICE_UNAVAILABLE: "Service Unavailable",
 }
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+MAX_PROFILE_SECONDS = 60
+RETRY_AFTER = 1
 
 
 class ClientsInterestsRequest(Validatable):
@@ -65,6 +88,22 @@ class OnlineScoreRequest(Validatable):
             raise ValueError("Please provide correct request params")
 
 
+class ProfileRequest(Validatable):
+    seconds = PositiveIntField(required=True, nullable=False)
+
+    def post_validate(self):
+        if self.seconds and self.seconds > MAX_PROFILE_SECONDS:
+            raise ValueError(f"Profiling is limited to {MAX_PROFILE_SECONDS} seconds")
+
+
+class TraceRequest(Validatable):
+    request_id = CharField(required=False, nullable=True)
+
+
+class HotKeysRequest(Validatable):
+    limit = PositiveIntField(required=False, nullable=True)
+
+
 class MethodRequest(Validatable):
     account = CharField(required=False, nullable=True)
     login = CharField(required=True, nullable=True)
@@ -89,19 +128,51 @@ def check_auth(request):
     return digest == request.token
 
 
+def check_rate_limits(
+    rate_limiters: list[RateLimiter | RedisRateLimiter], key: str
+) -> float:
+    """
+    Check per-client limits.
+    :return: 0 if request is allowed, otherwise seconds to retry after
+    """
+    for limiter in rate_limiters:
+        retry_after = limiter.acquire(key)
+        if retry_after:
+            return retry_after
+    return 0.0
+
+
 def method_handler(request, ctx, store):
-    method_request: MethodRequest = MethodRequest.validate(request.get("body"))
+    with tracer.span("validate"):
+        method_request: MethodRequest = MethodRequest.validate(request.get("body"))
     if not method_request.is_valid:
         return str(method_request.validation_errors), 422
 
-    if not check_auth(method_request):
+    rate_limiters = request.get("rate_limiters") or []
+    with tracer.span("check_auth"):
+        is_authorized = check_auth(method_request)
+    if not is_authorized:
+        # Failed attempts are limited by peer, so they can't drain limits of the login
+        # they claim to be
+        retry_after = check_rate_limits(rate_limiters, f"peer:{request.get('peer')}")
+        if retry_after:
+            ctx["retry_after"] = retry_after
+            return None, TOO_MANY_REQUESTS
         return "Forbidden", 403
 
+    retry_after = check_rate_limits(
+        rate_limiters, f"{method_request.account or ''}:{method_request.login or ''}"
+    )
+    if retry_after:
+        ctx["retry_after"] = retry_after
+        return None, TOO_MANY_REQUESTS
+
     match method_request.method:
         case "online_score":
-            online_score_args: OnlineScoreRequest = OnlineScoreRequest.validate(
-                method_request.arguments
-            )
+            with tracer.span("validate_arguments"):
+                online_score_args: OnlineScoreRequest = OnlineScoreRequest.validate(
+                    method_request.arguments
+                )
             ctx["has"] = online_score_args.has
 
             if not online_score_args.is_valid:
@@ -110,8 +181,8 @@ def method_handler(request, ctx, store):
             if method_request.is_admin:
                 return {"score": 42}, 200
 
-            return {
-                "score": get_score(
+            with tracer.span("scoring"):
+                score = get_score(
                     store=store,
                     phone=online_score_args.phone,
                     email=online_score_args.email,
@@ -119,27 +190,88 @@ def method_handler(request, ctx, store):
                     gender=online_score_args.gender,
                     first_name=online_score_args.first_name,
                     last_name=online_score_args.last_name,
+                    # Score is computed without cache while the store is known to be down
+                    use_cache=not ctx.get("degraded"),
                 )
-            }, 200
+            return {"score": score}, 200
         case "clients_interests":
-            clients_interests_args: ClientsInterestsRequest = (
-                ClientsInterestsRequest.validate(method_request.arguments)
-            )
+            with tracer.span("validate_arguments"):
+                clients_interests_args: ClientsInterestsRequest = (
+                    ClientsInterestsRequest.validate(method_request.arguments)
+                )
 
             if not clients_interests_args.is_valid:
                 return str(method_request.validation_errors), 422
 
             ctx["nclients"] = len(clients_interests_args.client_ids)
 
-            return {
-                f"{client_id}": get_interests(store, client_id)
-                for client_id in clients_interests_args.client_ids
-            }, 200
+            if ctx.get("degraded"):
+                return "Interests store is unavailable", 503
+
+            chunks = iter_interests(
+                store,
+                clients_interests_args.client_ids,
+                day=clients_interests_args.date,
+            )
+            if ctx.get("stream"):
+                return chunks, 200
+
+            with tracer.span("interests", nclients=ctx["nclients"]):
+                interests = {}
+                for chunk in chunks:
+                    interests.update(chunk)
+            return interests, 200
+        case "profile":
+            if not method_request.is_admin:
+                return "Forbidden", 403
+
+            profile_args: ProfileRequest = ProfileRequest.validate(
+                method_request.arguments
+            )
+            if not profile_args.is_valid:
+                return str(profile_args.validation_errors), 422
+
+            try:
+                return profiler.capture(profile_args.seconds), 200
+            except ProfilerBusyError as e:
+                return str(e), 409
+        case "trace":
+            if not method_request.is_admin:
+                return "Forbidden", 403
+
+            trace_args: TraceRequest = TraceRequest.validate(method_request.arguments)
+            if not trace_args.is_valid:
+                return str(trace_args.validation_errors), 422
+
+            return tracer.export(trace_args.request_id), 200
+        case "hotkeys":
+            if not method_request.is_admin:
+                return "Forbidden", 403
+
+            hot_keys_args: HotKeysRequest = HotKeysRequest.validate(
+                method_request.arguments
+            )
+            if not hot_keys_args.is_valid:
+                return str(hot_keys_args.validation_errors), 422
+
+            return hot_keys.export(hot_keys_args.limit), 200
 
 
 class MainHTTPHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 is required for chunked transfer encoding of streamed responses
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, with Nagle's algorithm the body would wait
+    # for the client's delayed ACK (~40ms) on keep-alive connections
+    disable_nagle_algorithm = True
     router = {"method": method_handler}
     store: Store | None = None
+    admission: AdmissionController | None = None
+    rate_limiters: list[RateLimiter | RedisRateLimiter] = []
+    health: HealthMonitor | None = None
+    compression = True
+    # Smaller responses are sent as is, compression would cost more than it saves
+    compression_min_size = 1024
+    compression_level = 6
 
     def get_store(self) -> Store:
         if not self.store:
@@ -149,41 +281,201 @@ class MainHTTPHandler(BaseHTTPRequestHandler):
     def get_request_id(self, headers):
         return headers.get("HTTP_X_REQUEST_ID", uuid.uuid4().hex)
 
+    def do_GET(self):
+        context = {"request_id": self.get_request_id(self.headers)}
+        match self.path.strip("/"):
+            case "healthz":
+                self.write_response({"status": "ok"}, OK, context)
+            case "readyz":
+                if self.health is None:
+                    self.write_response({"healthy": True}, OK, context)
+                else:
+                    state = self.health.state()
+                    code = OK if state["healthy"] else SERVICE_UNAVAILABLE
+                    self.write_response(state, code, context)
+            case _:
+                self.write_response(None, NOT_FOUND, context)
+
     def do_POST(self):
-        response, code = {}, OK
         context = {"request_id": self.get_request_id(self.headers)}
+        request_id_token = request_id_var.set(context["request_id"])
+        try:
+            with tracer.span("request", path=self.path):
+                self.handle_post(context)
+        finally:
+            request_id_var.reset(request_id_token)
+
+    def response_encoding(self) -> str | None:
+        if not self.compression:
+            return None
+        return negotiate(self.headers.get("Accept-Encoding"))
+
+    def accepts_stream(self) -> bool:
+        return self.request_version != "HTTP/1.0" and NDJSON in self.headers.get(
+            "Accept", ""
+        )
+
+    def handle_post(self, context: dict):
+        response, code = {}, OK
+        headers: dict[str, str] = {}
+        admitted = False
         request = None
         data_string: bytes | None = None
         try:
-            data_string = self.rfile.read(int(self.headers["Content-Length"]))
-            request = json.loads(data_string)
+            with tracer.span("parse_json"):
+                data_string = self.rfile.read(int(self.headers["Content-Length"]))
+                if self.headers.get("Content-Encoding"):
+                    data_string = decompress(
+                        self.headers["Content-Encoding"], data_string
+                    )
+                request = json.loads(data_string)
         except Exception as e:
             logging.error(f"Error on json request parsing {e}")
             code = BAD_REQUEST
+            # Request body may be left unread, so the connection can't be reused
+            self.close_connection = True
 
         if request:
+            context["stream"] = self.accepts_stream()
+            context["degraded"] = self.health is not None and self.health.degraded
             path = self.path.strip("/")
             logging.info("%s: %r %s" % (self.path, data_string, context["request_id"]))
             if path in self.router:
-                try:
-                    response, code = self.router[path](
-                        {"body": request, "headers": self.headers},
-                        context,
-                        self.get_store(),
-                    )
-                except Exception as e:
-                    logging.exception("Unexpected error: %s" % e)
-                    code = INTERNAL_ERROR
+                if self.admission is not None and not self.admission.acquire():
+                    code = SERVICE_UNAVAILABLE
+                    headers["Retry-After"] = str(RETRY_AFTER)
+                else:
+                    admitted = self.admission is not None
+                    try:
+                        response, code = self.router[path](
+                            {
+                                "body": request,
+                                "headers": self.headers,
+                                "rate_limiters": self.rate_limiters,
+                                "peer": self.client_address[0],
+                            },
+                            context,
+                            self.get_store(),
+                        )
+                    except Exception as e:
+                        logging.exception("Unexpected error: %s" % e)
+                        code = INTERNAL_ERROR
+                    if code == TOO_MANY_REQUESTS:
+                        retry_after = context.pop("retry_after", RETRY_AFTER)
+                        headers["Retry-After"] = str(math.ceil(retry_after))
             else:
                 code = NOT_FOUND
 
-        self.send_response(code)
-        self.send_header("Content-Type", "application/json")
-        self.end_headers()
+        try:
+            if isinstance(response, Iterator):
+                self.write_stream(response, context)
+            else:
+                self.write_response(response, code, context, headers)
+        finally:
+            if admitted and self.admission is not None:
+                self.admission.release()
+
+    def write_response(
+        self, response, code: int, context: dict, headers: dict | None = None
+    ):
         if code not in ERRORS:
             r = {"response": response, "code": code}
         else:
             r = {"error": response or ERRORS.get(code, "Unknown Error"), "code": code}
         context.update(r)
+        with tracer.span("write_response"):
+            body = json.dumps(r).encode("utf-8")
+            coding = self.response_encoding()
+            if coding and len(body) >= self.compression_min_size:
+                body = self.compress(coding, body, context)
+            self.send_response(code)
+            self.send_header("Content-Type", JSON)
+            self.send_header("Content-Length", str(len(body)))
+            if self.compression:
+                self.send_header("Vary", "Accept-Encoding")
+            if coding and "compression" in context:
+                self.send_header("Content-Encoding", coding)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+        logging.info(context)
+
+    def compress(self, coding: str, body: bytes, context: dict) -> bytes:
+        stats = CompressionStats(coding)
+        body_compressor = compressor(coding, self.compression_level)
+        with tracer.span("compress") as span:
+            body = stats.run(body_compressor.compress, body) + stats.run(
+                lambda _: body_compressor.finish(), b""
+            )
+            span.tag(**stats.as_dict())
+        context["compression"] = stats.as_dict()
+        return body
+
+    def write_chunk(self, data: bytes):
+        # Empty chunk would terminate the response
+        if not data:
+            return
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+    def write_stream(self, chunks: Iterator[dict], context: dict):
+        """
+        Write response as NDJSON with chunked transfer encoding, one {key: value} line per entry.
+        Each chunk of entries is sent as soon as it's read, so memory is bounded by chunk size.
+        """
+        # Read first chunk before sending headers, so early failures get a proper status code
+        try:
+            chunk = next(chunks, None)
+        except Exception as e:
+            logging.exception("Unexpected error: %s" % e)
+            self.write_response(None, INTERNAL_ERROR, context)
+            return
+
+        # Streamed response size is unknown upfront, so it's compressed whenever client accepts it
+        coding = self.response_encoding()
+        stats = CompressionStats(coding) if coding else None
+        stream_compressor = (
+            compressor(coding, self.compression_level) if coding else None
+        )
+
+        def encode(data: bytes) -> bytes:
+            if stats is None or stream_compressor is None:
+                return data
+            return stats.run(stream_compressor.compress, data)
+
+        self.send_response(OK)
+        self.send_header("Content-Type", NDJSON)
+        self.send_header("Transfer-Encoding", "chunked")
+        if self.compression:
+            self.send_header("Vary", "Accept-Encoding")
+        if coding:
+            self.send_header("Content-Encoding", coding)
+        self.end_headers()
+        entries = 0
+        with tracer.span("write_stream") as span:
+            try:
+                while chunk is not None:
+                    entries += len(chunk)
+                    self.write_chunk(
+                        encode(
+                            "".join(
+                                json.dumps({key: value}) + "\n"
+                                for key, value in chunk.items()
+                            ).encode("utf-8")
+                        )
+                    )
+                    chunk = next(chunks, None)
+                context["code"] = OK
+            except Exception as e:
+                # Status is already sent, the error is reported as the last line
+                logging.exception("Unexpected error: %s" % e)
+                context["code"] = INTERNAL_ERROR
+                error = {"error": ERRORS[INTERNAL_ERROR], "code": INTERNAL_ERROR}
+                self.write_chunk(encode((json.dumps(error) + "\n").encode("utf-8")))
+            if stats is not None and stream_compressor is not None:
+                self.write_chunk(stats.run(lambda _: stream_compressor.finish(), b""))
+                context["compression"] = stats.as_dict()
+                span.tag(**stats.as_dict())
+            self.wfile.write(b"0\r\n\r\n")
+        context["entries"] = entries
         logging.info(context)
-        self.wfile.write(json.dumps(r).encode("utf-8"))
@@ -0,0 +1,398 @@
+import concurrent.futures
+import itertools
+import logging
+import math
+import socket
+import socketserver
+import struct
+import threading
+import uuid
+from typing import Any
+
+from homework_05.api import (
+    ERRORS,
+    INTERNAL_ERROR,
+    NOT_FOUND,
+    OK,
+    RETRY_AFTER,
+    SERVICE_UNAVAILABLE,
+    TOO_MANY_REQUESTS,
+    MainHTTPHandler,
+)
+from homework_05.tracing import request_id_var, tracer
+
+# Frame: payload length and request id (big-endian uint32), then the payload
+FRAME_HEADER = struct.Struct(">II")
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+# Nesting of arrays and maps, deeper payloads are rejected before the recursion limit
+MAX_DEPTH = 32
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def packb(obj: Any) -> bytes:
+    """
+    Encode object with MessagePack subset: nil, bool, int, float, str, bin, array, map.
+    """
+    chunks: list[bytes] = []
+    _pack(obj, chunks)
+    return b"".join(chunks)
+
+
+def _pack(obj: Any, out: list[bytes]):
+    if obj is None:
+        out.append(b"\xc0")
+    elif obj is True:
+        out.append(b"\xc3")
+    elif obj is False:
+        out.append(b"\xc2")
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(struct.pack("B", obj))
+        elif -32 <= obj < 0:
+            out.append(struct.pack("b", obj))
+        elif 0 <= obj < 2**64:
+            out.append(b"\xcf" + struct.pack(">Q", obj))
+        elif -(2**63) <= obj < 0:
+            out.append(b"\xd3" + struct.pack(">q", obj))
+        else:
+            raise ProtocolError(f"Integer {obj} is out of range")
+    elif isinstance(obj, float):
+        out.append(b"\xcb" + struct.pack(">d", obj))
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        size = len(data)
+        if size < 32:
+            out.append(struct.pack("B", 0xA0 | size))
+        elif size < 2**8:
+            out.append(b"\xd9" + struct.pack("B", size))
+        elif size < 2**16:
+            out.append(b"\xda" + struct.pack(">H", size))
+        else:
+            out.append(b"\xdb" + struct.pack(">I", size))
+        out.append(data)
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        data = bytes(obj)
+        size = len(data)
+        if size < 2**8:
+            out.append(b"\xc4" + struct.pack("B", size))
+        elif size < 2**16:
+            out.append(b"\xc5" + struct.pack(">H", size))
+        else:
+            out.append(b"\xc6" + struct.pack(">I", size))
+        out.append(data)
+    elif isinstance(obj, (list, tuple)):
+        size = len(obj)
+        if size < 16:
+            out.append(struct.pack("B", 0x90 | size))
+        elif size < 2**16:
+            out.append(b"\xdc" + struct.pack(">H", size))
+        else:
+            out.append(b"\xdd" + struct.pack(">I", size))
+        for item in obj:
+            _pack(item, out)
+    elif isinstance(obj, dict):
+        size = len(obj)
+        if size < 16:
+            out.append(struct.pack("B", 0x80 | size))
+        elif size < 2**16:
+            out.append(b"\xde" + struct.pack(">H", size))
+        else:
+            out.append(b"\xdf" + struct.pack(">I", size))
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    else:
+        raise ProtocolError(f"Unsupported type {type(obj).__name__}")
+
+
+# Fixed size formats: type byte -> (struct format, size)
+_FIXED = {
+    0xCA: (">f", 4),
+    0xCB: (">d", 8),
+    0xCC: (">B", 1),
+    0xCD: (">H", 2),
+    0xCE: (">I", 4),
+    0xCF: (">Q", 8),
+    0xD0: (">b", 1),
+    0xD1: (">h", 2),
+    0xD2: (">i", 4),
+    0xD3: (">q", 8),
+}
+# Sized types: type byte -> (kind, length format, length size)
+_SIZED = {
+    0xC4: ("bin", ">B", 1),
+    0xC5: ("bin", ">H", 2),
+    0xC6: ("bin", ">I", 4),
+    0xD9: ("str", ">B", 1),
+    0xDA: ("str", ">H", 2),
+    0xDB: ("str", ">I", 4),
+    0xDC: ("array", ">H", 2),
+    0xDD: ("array", ">I", 4),
+    0xDE: ("map", ">H", 2),
+    0xDF: ("map", ">I", 4),
+}
+
+
+def unpackb(data: bytes) -> Any:
+    try:
+        obj, offset = _unpack(memoryview(data), 0, 0)
+    except (
+        IndexError,
+        struct.error,
+        UnicodeDecodeError,
+        TypeError,
+        RecursionError,
+    ) as e:
+        # TypeError is raised on unhashable map keys, e.g. arrays
+        raise ProtocolError(f"Malformed payload: {e}") from e
+    if offset != len(data):
+        raise ProtocolError("Extra data after payload")
+    return obj
+
+
+def _unpack(data: memoryview, offset: int, depth: int) -> tuple[Any, int]:
+    code = data[offset]
+    offset += 1
+    if code < 0x80:
+        return code, offset
+    if code >= 0xE0:
+        return code - 0x100, offset
+    if code == 0xC0:
+        return None, offset
+    if code == 0xC2:
+        return False, offset
+    if code == 0xC3:
+        return True, offset
+    if code in _FIXED:
+        fmt, size = _FIXED[code]
+        return struct.unpack_from(fmt, data, offset)[0], offset + size
+
+    if 0xA0 <= code <= 0xBF:
+        kind, size = "str", code & 0x1F
+    elif 0x90 <= code <= 0x9F:
+        kind, size = "array", code & 0x0F
+    elif 0x80 <= code <= 0x8F:
+        kind, size = "map", code & 0x0F
+    elif code in _SIZED:
+        kind, fmt, length_size = _SIZED[code]
+        size = struct.unpack_from(fmt, data, offset)[0]
+        offset += length_size
+    else:
+        raise ProtocolError(f"Unsupported type 0x{code:02x}")
+
+    if kind in ("str", "bin"):
+        if offset + size > len(data):
+            raise IndexError("Truncated payload")
+        raw = bytes(data[offset : offset + size])
+        return (raw.decode("utf-8") if kind == "str" else raw), offset + size
+    if depth >= MAX_DEPTH:
+        raise ProtocolError(f"Payload is nested deeper than {MAX_DEPTH} levels")
+    if kind == "array":
+        items = []
+        for _ in range(size):
+            item, offset = _unpack(data, offset, depth + 1)
+            items.append(item)
+        return items, offset
+    result = {}
+    for _ in range(size):
+        key, offset = _unpack(data, offset, depth + 1)
+        result[key], offset = _unpack(data, offset, depth + 1)
+    return result, offset
+
+
+def read_exactly(sock: socket.socket, size: int) -> bytes | None:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def read_frame(sock: socket.socket) -> tuple[int, bytes] | None:
+    header = read_exactly(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    size, request_id = FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame of {size} bytes is too large")
+    payload = read_exactly(sock, size)
+    if payload is None:
+        return None
+    return request_id, payload
+
+
+def frame(request_id: int, payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(len(payload), request_id) + payload
+
+
+def handle_request(request: Any, peer: str | None = None) -> dict:
+    """
+    Route decoded request {"path": ..., "body": ...} to the same handlers as HTTP API,
+    with the same admission control and rate limits.
+    :return: Response envelope, same as HTTP API returns, with "retry_after" seconds
+        for 429 and 503 instead of the Retry-After header
+    """
+    response, code = None, OK
+    retry_after = None
+    context: dict[str, Any] = {"request_id": uuid.uuid4().hex}
+    token = request_id_var.set(context["request_id"])
+    try:
+        with tracer.span("binary_request"):
+            path = request.get("path", "method") if isinstance(request, dict) else None
+            handler = (
+                MainHTTPHandler.router.get(path) if isinstance(path, str) else None
+            )
+            admission = MainHTTPHandler.admission
+            if handler is None:
+                code = NOT_FOUND
+            elif admission is not None and not admission.acquire():
+                code = SERVICE_UNAVAILABLE
+                retry_after = RETRY_AFTER
+            else:
+                health = MainHTTPHandler.health
+                context["degraded"] = health is not None and health.degraded
+                try:
+                    response, code = handler(
+                        {
+                            "body": request.get("body") or {},
+                            "headers": {},
+                            "rate_limiters": MainHTTPHandler.rate_limiters,
+                            "peer": peer,
+                        },
+                        context,
+                        MainHTTPHandler.store,
+                    )
+                except Exception as e:
+                    logging.exception("Unexpected error: %s" % e)
+                    code = INTERNAL_ERROR
+                finally:
+                    if admission is not None:
+                        admission.release()
+                if code == TOO_MANY_REQUESTS:
+                    retry_after = math.ceil(context.pop("retry_after", RETRY_AFTER))
+    finally:
+        request_id_var.reset(token)
+
+    if code not in ERRORS:
+        return {"response": response, "code": code}
+    result = {"error": response or ERRORS.get(code, "Unknown Error"), "code": code}
+    if retry_after is not None:
+        result["retry_after"] = retry_after
+    return result
+
+
+class BinaryRequestHandler(socketserver.BaseRequestHandler):
+    """
+    Reads frames from the connection and processes them concurrently, responses are
+    written in completion order and matched by request id on the client side.
+    At most `max_inflight` requests of a connection are processed or queued at once,
+    then the connection isn't read until one of them is answered.
+    """
+
+    server: "BinaryServer"
+
+    def handle(self):
+        write_lock = threading.Lock()
+        inflight = threading.BoundedSemaphore(self.server.max_inflight)
+        peer = self.client_address[0]
+
+        def process(request_id: int, payload: bytes):
+            try:
+                try:
+                    data = frame(
+                        request_id, packb(handle_request(unpackb(payload), peer))
+                    )
+                except ProtocolError as e:
+                    data = frame(request_id, packb({"error": str(e), "code": 400}))
+                except Exception as e:
+                    logging.exception("Unexpected error: %s" % e)
+                    data = frame(
+                        request_id,
+                        packb(
+                            {"error": ERRORS[INTERNAL_ERROR], "code": INTERNAL_ERROR}
+                        ),
+                    )
+                try:
+                    with write_lock:
+                        self.request.sendall(data)
+                except OSError as e:
+                    logging.error(f"Error on binary response writing: {e}")
+            finally:
+                inflight.release()
+
+        try:
+            while True:
+                received = read_frame(self.request)
+                if received is None:
+                    return
+                inflight.acquire()
+                self.server.executor.submit(process, *received)
+        except (ProtocolError, OSError) as e:
+            logging.error(f"Binary protocol connection is closed: {e}")
+
+
+class BinaryServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self, server_address: tuple[str, int], workers: int = 32, max_inflight: int = 64
+    ):
+        self.executor = concurrent.futures.ThreadPoolExecutor(workers)
+        self.max_inflight = max_inflight
+        super().__init__(server_address, BinaryRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+
+class BinaryClient:
+    """
+    Thread-safe client: any number of calls may be outstanding on one connection.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = 10.0):
+        self.timeout = timeout
+        self.__sock = socket.create_connection((host, port))
+        self.__ids = itertools.count(1)
+        self.__write_lock = threading.Lock()
+        self.__pending: dict[int, concurrent.futures.Future] = {}
+        self.__reader = threading.Thread(target=self.__read, daemon=True)
+        self.__reader.start()
+
+    def __read(self):
+        error: Exception = ConnectionError("Connection is closed")
+        try:
+            while (received := read_frame(self.__sock)) is not None:
+                request_id, payload = received
+                future = self.__pending.pop(request_id, None)
+                if future is not None:
+                    future.set_result(unpackb(payload))
+        except (ProtocolError, OSError) as e:
+            error = e
+        for future in list(self.__pending.values()):
+            future.set_exception(error)
+        self.__pending.clear()
+
+    def submit(self, body: dict, path: str = "method") -> concurrent.futures.Future:
+        request_id = next(self.__ids) & 0xFFFFFFFF
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        self.__pending[request_id] = future
+        data = frame(request_id, packb({"path": path, "body": body}))
+        with self.__write_lock:
+            self.__sock.sendall(data)
+        return future
+
+    def call(self, body: dict, path: str = "method") -> dict:
+        return self.submit(body, path).result(self.timeout)
+
+    def close(self):
+        self.__sock.shutdown(socket.SHUT_RDWR)
+        self.__sock.close()
+        self.__reader.join()
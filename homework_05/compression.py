@@ -0,0 +1,177 @@
+import time
+import zlib
+from typing import Any, Callable
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover
+    brotli = None  # type: ignore
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+# Decompressed request body limit, protects from decompression bombs
+MAX_DECOMPRESSED_SIZE = 64 * 1024 * 1024
+
+
+class UnsupportedEncoding(ValueError):
+    pass
+
+
+class ZlibCompressor:
+    def __init__(self, level: int, wbits: int):
+        self.__compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, data: bytes) -> bytes:
+        # Sync flush makes every chunk decodable as soon as it's received
+        return self.__compressor.compress(data) + self.__compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        return self.__compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self, level: int):
+        self.__compressor = brotli.Compressor(quality=min(level, 11))
+
+    def compress(self, data: bytes) -> bytes:
+        return self.__compressor.process(data) + self.__compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.__compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level: int):
+        self.__compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self.__compressor.compress(data) + self.__compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        return self.__compressor.flush()
+
+
+def zlib_decompress(data: bytes, wbits: int) -> bytes:
+    decompressor = zlib.decompressobj(wbits)
+    result = decompressor.decompress(data, MAX_DECOMPRESSED_SIZE)
+    if decompressor.unconsumed_tail:
+        raise ValueError("Decompressed request body is too large")
+    return result
+
+
+def brotli_decompress(data: bytes) -> bytes:
+    decompressor = brotli.Decompressor()
+    # Output stops growing at the limit, the rest of the input stays undecoded
+    result = decompressor.process(data, output_buffer_limit=MAX_DECOMPRESSED_SIZE + 1)
+    if len(result) > MAX_DECOMPRESSED_SIZE or not decompressor.can_accept_more_data():
+        raise ValueError("Decompressed request body is too large")
+    if not decompressor.is_finished():
+        raise ValueError("Truncated brotli stream")
+    return result
+
+
+def zstd_decompress(data: bytes) -> bytes:
+    # ZstdDecompressor.decompress ignores max_output_size if the frame declares its size
+    result = bytearray()
+    decompressor = zstandard.ZstdDecompressor()
+    with decompressor.stream_reader(data, read_across_frames=True) as reader:
+        while chunk := reader.read(MAX_DECOMPRESSED_SIZE + 1 - len(result)):
+            result += chunk
+            if len(result) > MAX_DECOMPRESSED_SIZE:
+                raise ValueError("Decompressed request body is too large")
+    return bytes(result)
+
+
+# Content coding -> (compressor factory by level, decompress function).
+# Order defines preference when client accepts several codings with the same weight.
+CODECS: dict[str, tuple[Callable[[int], Any], Callable[[bytes], bytes]]] = {}
+if zstandard is not None:
+    CODECS["zstd"] = (ZstdCompressor, zstd_decompress)
+if brotli is not None:
+    CODECS["br"] = (BrotliCompressor, brotli_decompress)
+CODECS["gzip"] = (
+    lambda level: ZlibCompressor(level, 16 + zlib.MAX_WBITS),
+    lambda data: zlib_decompress(data, 16 + zlib.MAX_WBITS),
+)
+CODECS["deflate"] = (
+    lambda level: ZlibCompressor(level, zlib.MAX_WBITS),
+    lambda data: zlib_decompress(data, zlib.MAX_WBITS),
+)
+
+
+def negotiate(accept_encoding: str | None) -> str | None:
+    """
+    Choose response content coding by Accept-Encoding header.
+    :return: Coding name or None for identity
+    """
+    if not accept_encoding:
+        return None
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for name in CODECS:
+        weight = weights.get(name, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+def compressor(coding: str, level: int) -> Any:
+    return CODECS[coding][0](level)
+
+
+def decompress(coding: str, data: bytes) -> bytes:
+    coding = coding.strip().lower()
+    if coding in ("", "identity"):
+        return data
+    if coding not in CODECS:
+        raise UnsupportedEncoding(f"Unsupported content encoding '{coding}'")
+    return CODECS[coding][1](data)
+
+
+class CompressionStats:
+    """
+    Accumulates sizes and CPU time of a (possibly streamed) compression.
+    """
+
+    def __init__(self, coding: str):
+        self.coding = coding
+        self.raw_size = 0
+        self.compressed_size = 0
+        self.cpu_time = 0.0
+
+    def run(self, compress: Callable[[bytes], bytes], data: bytes) -> bytes:
+        started = time.thread_time()
+        result = compress(data)
+        self.cpu_time += time.thread_time() - started
+        self.raw_size += len(data)
+        self.compressed_size += len(result)
+        return result
+
+    def as_dict(self) -> dict:
+        return {
+            "coding": self.coding,
+            "raw_size": self.raw_size,
+            "compressed_size": self.compressed_size,
+            "ratio": round(self.raw_size / self.compressed_size, 3)
+            if self.compressed_size
+            else None,
+            "cpu_ms": round(self.cpu_time * 1000, 3),
+        }
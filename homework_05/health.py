@@ -0,0 +1,104 @@
+import collections
+import logging
+import threading
+import time
+
+from homework_05.store import Store
+
+logger = logging.getLogger()
+
+
+class HealthMonitor:
+    """
+    Pings the store in background and keeps its health state: smoothed round trip time
+    and error rate over the last `window` checks. Request handlers read the cached state
+    instead of finding out about an outage by a timeout.
+    """
+
+    def __init__(
+        self,
+        store: Store,
+        interval: float = 1.0,
+        window: int = 20,
+        max_error_rate: float = 0.5,
+        rtt_smoothing: float = 0.2,
+    ):
+        self.store = store
+        self.interval = interval
+        self.max_error_rate = max_error_rate
+        self.rtt_smoothing = rtt_smoothing
+        self.rtt: float | None = None
+        self.last_error: str | None = None
+        self.last_check: float | None = None
+        self.__results: collections.deque[bool] = collections.deque(maxlen=window)
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(
+            target=self.run, name="store-health", daemon=True
+        )
+
+    def start(self):
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        self.__thread.join()
+
+    def check(self):
+        started = time.monotonic()
+        try:
+            self.store.ping()
+        except Exception as e:
+            if self.last_error is None:
+                logger.error(f"Store health check failed: {e}")
+            self.last_error = str(e)
+            self.__results.append(False)
+        else:
+            rtt = time.monotonic() - started
+            if self.rtt is None:
+                self.rtt = rtt
+            else:
+                self.rtt += self.rtt_smoothing * (rtt - self.rtt)
+            if self.last_error is not None:
+                logger.info("Store health check succeeded again")
+            self.last_error = None
+            self.__results.append(True)
+        self.last_check = time.monotonic()
+
+    def run(self):
+        while not self.__stop.is_set():
+            self.check()
+            self.__stop.wait(self.interval)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.__results:
+            return 0.0
+        return self.__results.count(False) / len(self.__results)
+
+    @property
+    def healthy(self) -> bool:
+        """
+        Store is healthy if it's checked and error rate over the window is acceptable,
+        so a single failed check doesn't degrade it unless `max_error_rate` allows no errors.
+        """
+        return bool(self.__results) and self.error_rate <= self.max_error_rate
+
+    @property
+    def degraded(self) -> bool:
+        """
+        Store is checked and found unhealthy. Requests are served as usual until the first
+        check, while readiness probe still reports the store as not ready.
+        """
+        return bool(self.__results) and not self.healthy
+
+    def state(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "rtt_ms": None if self.rtt is None else round(self.rtt * 1000, 3),
+            "error_rate": self.error_rate,
+            "checks": len(self.__results),
+            "last_error": self.last_error,
+            "last_check_age": None
+            if self.last_check is None
+            else round(time.monotonic() - self.last_check, 3),
+        }
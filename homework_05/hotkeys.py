@@ -0,0 +1,195 @@
+import threading
+import time
+from array import array
+from typing import Any, Iterator
+
+from homework_05.local_cache import LocalCache
+from homework_05.store import Store, to_bytes
+
+
+class CountMinSketch:
+    """
+    Approximate access counters in constant memory: `depth` rows of `width` counters,
+    a key estimate is the minimum of its counters, so it's never underestimated.
+    """
+
+    def __init__(self, width: int = 4096, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.__rows = [array("L", bytes(8 * width)) for _ in range(depth)]
+
+    def __indexes(self, key: Any) -> list[int]:
+        # Double hashing: row i uses h1 + i * h2
+        key_hash = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = key_hash & 0xFFFFFFFF, (key_hash >> 32) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key: Any) -> int:
+        """
+        Count key access.
+        :return: Estimated number of key accesses
+        """
+        estimate = None
+        for row, index in zip(self.__rows, self.__indexes(key)):
+            row[index] += 1
+            if estimate is None or row[index] < estimate:
+                estimate = row[index]
+        return estimate or 0
+
+    def estimate(self, key: Any) -> int:
+        return min(row[index] for row, index in zip(self.__rows, self.__indexes(key)))
+
+    def decay(self):
+        for row in self.__rows:
+            for i in range(self.width):
+                row[i] >>= 1
+
+
+class HotKeyTracker:
+    """
+    Streaming heavy hitters: count-min sketch estimates plus the top `k` keys by estimate.
+    Counters are halved every `decay_every` accesses, so the top follows current traffic.
+    """
+
+    def __init__(
+        self,
+        k: int = 100,
+        width: int = 4096,
+        depth: int = 4,
+        decay_every: int = 1_000_000,
+    ):
+        self.k = k
+        self.decay_every = decay_every
+        self.accesses = 0
+        self.__sketch = CountMinSketch(width, depth)
+        self.__top: dict[Any, int] = {}
+        self.__min_key: Any = None
+        self.__lock = threading.Lock()
+
+    def __update_min(self):
+        self.__min_key = min(self.__top, key=self.__top.__getitem__, default=None)
+
+    def record(self, key: Any):
+        with self.__lock:
+            self.accesses += 1
+            count = self.__sketch.add(key)
+            if key in self.__top:
+                self.__top[key] = count
+                if key == self.__min_key:
+                    self.__update_min()
+            elif len(self.__top) < self.k:
+                self.__top[key] = count
+                self.__update_min()
+            elif count > self.__top[self.__min_key]:
+                del self.__top[self.__min_key]
+                self.__top[key] = count
+                self.__update_min()
+
+            if self.accesses % self.decay_every == 0:
+                self.__sketch.decay()
+                self.__top = {key: count >> 1 for key, count in self.__top.items()}
+
+    def top(self, limit: int | None = None) -> list[tuple[Any, int]]:
+        with self.__lock:
+            items = sorted(self.__top.items(), key=lambda item: item[1], reverse=True)
+        return items[:limit]
+
+    def export(self, limit: int | None = None) -> dict:
+        return {
+            "accesses": self.accesses,
+            "keys": [
+                {
+                    "key": key.decode("utf-8", "backslashreplace")
+                    if isinstance(key, bytes)
+                    else str(key),
+                    "count": count,
+                }
+                for key, count in self.top(limit)
+            ],
+        }
+
+
+class HotKeyStore(Store):
+    """
+    Store wrapper feeding every key access to HotKeyTracker. If local cache is given,
+    the current top keys are pinned in it (refreshed every `pin_interval` seconds).
+    """
+
+    def __init__(
+        self,
+        store: Store,
+        tracker: HotKeyTracker,
+        local_cache: LocalCache | None = None,
+        pin_interval: float = 10.0,
+    ):
+        self.store = store
+        self.tracker = tracker
+        self.local_cache = local_cache
+        self.pin_interval = pin_interval
+        self.__pinned_at = time.monotonic()
+
+    def __record(self, key: str):
+        self.tracker.record(key)
+        if self.local_cache is None:
+            return
+        now = time.monotonic()
+        if now - self.__pinned_at >= self.pin_interval:
+            self.__pinned_at = now
+            self.local_cache.pin({to_bytes(key) for key, _ in self.tracker.top()})
+
+    def ping(self):
+        self.store.ping()
+
+    def get(self, key: str) -> Any:
+        self.__record(key)
+        return self.store.get(key)
+
+    def get_many(self, keys: list[str]) -> list[Any]:
+        for key in keys:
+            self.__record(key)
+        return self.store.get_many(keys)
+
+    def get_many_json(
+        self, keys: list[str], names: list[str], default: str = "null"
+    ) -> bytes:
+        for key in keys:
+            self.__record(key)
+        return self.store.get_many_json(keys, names, default)
+
+    def cache_get(self, key: str) -> Any:
+        self.__record(key)
+        return self.store.cache_get(key)
+
+    def cache_get_or_set(
+        self, key: str, value: Any, ttl: int = 60, early_refresh: float = 0.0
+    ) -> Any:
+        self.__record(key)
+        return self.store.cache_get_or_set(key, value, ttl, early_refresh)
+
+    def cache_get_or_set_many(
+        self,
+        keys: list[str],
+        values: list[Any],
+        ttls: list[int],
+        early_refresh: list[float] | None = None,
+    ) -> list[Any]:
+        for key in keys:
+            self.__record(key)
+        return self.store.cache_get_or_set_many(keys, values, ttls, early_refresh)
+
+    def cache_set(self, key: str, value: Any, ttl: int = 60):
+        self.__record(key)
+        self.store.cache_set(key, value, ttl)
+
+    # Writes and key scans come from maintenance jobs, not from client traffic
+    def set(self, key: str, value: Any):
+        self.store.set(key, value)
+
+    def delete(self, keys: list[str]):
+        self.store.delete(keys)
+
+    def scan(self, pattern: str) -> Iterator[str]:
+        return self.store.scan(pattern)
+
+
+tracker = HotKeyTracker()
@@ -0,0 +1,268 @@
+import collections
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections.abc import Iterable
+from typing import Any, Callable
+
+logger = logging.getLogger()
+
+MISSING = object()
+
+# Snapshot file: header (magic, wall clock time of snapshot, number of entries) followed by
+# entries (wall clock expiration time, key length, value length or -1 for None, key, value)
+SNAPSHOT_MAGIC = b"LCS1"
+SNAPSHOT_HEADER = struct.Struct(">4sdI")
+SNAPSHOT_ENTRY = struct.Struct(">dIi")
+
+
+class LocalCache:
+    """
+    Process-local LRU cache with TTL. Every invalidation bumps `epoch`, so a value read
+    from the store before a concurrent invalidation can be rejected by `set`.
+    Pinned keys are never evicted by LRU, they still expire and get invalidated.
+    """
+
+    def __init__(self, max_size: int = 10_000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.__entries: collections.OrderedDict[bytes, tuple[Any, float]] = (
+            collections.OrderedDict()
+        )
+        self.__pinned: set[bytes] = set()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key: bytes) -> Any:
+        """
+        Get cached value.
+        :param key: Key to search
+        :return: Cached value (may be None for keys missing at store) or MISSING
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self.__entries[key]
+                self.misses += 1
+                return MISSING
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(
+        self, key: bytes, value: Any, ttl: float | None = None, epoch: int | None = None
+    ):
+        """
+        Put value to cache.
+        :param key: Key to store
+        :param value: Value to store
+        :param ttl: Time to life of value, cache default if not set
+        :param epoch: Cache epoch observed before value was read from the store.
+                      Value is dropped if any invalidation happened since then.
+        """
+        with self.__lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            self.__entries[key] = (value, time.monotonic() + (ttl or self.ttl))
+            self.__entries.move_to_end(key)
+            checked = 0
+            while len(self.__entries) > self.max_size and checked < len(self.__entries):
+                evicted, entry = self.__entries.popitem(last=False)
+                if evicted in self.__pinned:
+                    self.__entries[evicted] = entry
+                    checked += 1
+
+    def pin(self, keys: Iterable[bytes]):
+        """
+        Replace set of pinned keys. Pinned keys take at most half of the cache.
+        """
+        with self.__lock:
+            self.__pinned = set(list(keys)[: self.max_size // 2])
+
+    def entries(self) -> list[tuple[bytes, Any, float]]:
+        """
+        Live entries in LRU order.
+        :return: List of (key, value, remaining ttl) tuples
+        """
+        now = time.monotonic()
+        with self.__lock:
+            return [
+                (key, value, expires_at - now)
+                for key, (value, expires_at) in self.__entries.items()
+                if expires_at > now
+            ]
+
+    def load(self, entries: Iterable[tuple[bytes, Any, float]], epoch: int) -> int:
+        """
+        Put entries read before any cache use, e.g. from a snapshot. Nothing is loaded
+        if an invalidation happened since `epoch`, keys already cached are kept.
+        :return: Number of loaded entries
+        """
+        now = time.monotonic()
+        loaded = 0
+        with self.__lock:
+            if epoch != self.epoch:
+                return 0
+            # Most recently used entries go first, so they are kept if cache gets full
+            for key, value, ttl in reversed(list(entries)):
+                if key in self.__entries or len(self.__entries) >= self.max_size:
+                    continue
+                self.__entries[key] = (value, now + min(ttl, self.ttl))
+                # Loaded entries go before the ones used since start
+                self.__entries.move_to_end(key, last=False)
+                loaded += 1
+        return loaded
+
+    def invalidate(self, keys: list[bytes]):
+        with self.__lock:
+            self.epoch += 1
+            for key in keys:
+                self.__entries.pop(key, None)
+
+    def clear(self):
+        with self.__lock:
+            self.epoch += 1
+            self.__entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.__entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "epoch": self.epoch,
+            "pinned": len(self.__pinned),
+        }
+
+
+def write_snapshot(cache: LocalCache, path: str) -> int:
+    """
+    Write cache entries with bytes or None values to file. The file is replaced atomically,
+    readers see either previous or new snapshot.
+    :return: Number of written entries
+    """
+    now = time.time()
+    entries = [
+        (key, value, ttl)
+        for key, value, ttl in cache.entries()
+        if value is None or isinstance(value, bytes)
+    ]
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".local-cache-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, now, len(entries)))
+            for key, value, ttl in entries:
+                f.write(
+                    SNAPSHOT_ENTRY.pack(
+                        now + ttl, len(key), -1 if value is None else len(value)
+                    )
+                )
+                f.write(key)
+                if value is not None:
+                    f.write(value)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(entries)
+
+
+def read_snapshot(path: str) -> list[tuple[bytes, bytes | None, float]]:
+    """
+    Read not expired entries of snapshot file. The file is memory mapped, keys and values
+    of entries expired during downtime are skipped without being copied.
+    :return: List of (key, value, remaining ttl) tuples in LRU order
+    """
+    now = time.time()
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        magic, _, count = SNAPSHOT_HEADER.unpack_from(m, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a local cache snapshot")
+        entries = []
+        offset = SNAPSHOT_HEADER.size
+        for _ in range(count):
+            expires_at, key_size, value_size = SNAPSHOT_ENTRY.unpack_from(m, offset)
+            offset += SNAPSHOT_ENTRY.size
+            end = offset + key_size + max(value_size, 0)
+            if end > len(m):
+                raise ValueError(f"{path} is truncated")
+            if expires_at > now:
+                key = m[offset : offset + key_size]
+                value = None if value_size < 0 else m[offset + key_size : end]
+                entries.append((key, value, expires_at - now))
+            offset = end
+        return entries
+
+
+def restore_snapshot(cache: LocalCache, path: str) -> int:
+    """
+    Load snapshot file into cache. Missing or broken snapshot leaves cache as is.
+    :return: Number of restored entries
+    """
+    epoch = cache.epoch
+    try:
+        entries = read_snapshot(path)
+    except FileNotFoundError:
+        return 0
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Local cache snapshot {path} is not restored: {e}")
+        return 0
+    return cache.load(entries, epoch)
+
+
+class SnapshotWriter:
+    """
+    Writes local cache snapshot every `interval` seconds in background and once more on stop,
+    so a restarted process starts with a warm cache. Nothing is written while `active`
+    returns False: until the cache is restored from the snapshot and while it's flushed
+    because tracking is lost, writing it would replace the snapshot with an empty one.
+    """
+
+    def __init__(
+        self,
+        cache: LocalCache,
+        path: str,
+        interval: float = 30.0,
+        active: Callable[[], bool] = lambda: True,
+    ):
+        self.cache = cache
+        self.path = path
+        self.interval = interval
+        self.active = active
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(
+            target=self.run, name="local-cache-snapshot", daemon=True
+        )
+
+    def start(self):
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        self.__thread.join()
+        self.write()
+
+    def write(self):
+        if not self.active():
+            logger.info(f"Local cache snapshot {self.path} is kept, cache is inactive")
+            return
+        try:
+            write_snapshot(self.cache, self.path)
+        except Exception as e:
+            logger.error(f"Local cache snapshot {self.path} is not written: {e}")
+
+    def run(self):
+        while not self.__stop.wait(self.interval):
+            self.write()
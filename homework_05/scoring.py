@@ -1,16 +1,57 @@
 import hashlib
 import json
-from datetime import datetime
-from typing import Optional
+import math
+import random
+import struct
+from base64 import urlsafe_b64encode
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Iterator, Optional, Sequence
 
 from homework_05.store import Store
 
+try:
+    import numpy  # type: ignore
+except ImportError:  # pragma: no cover
+    numpy = None  # type: ignore
 
-def get_scoring_key(
+INTERESTS_CHUNK_SIZE = 100
+SCORE_TTL = 60 * 60
+# Scores are cached for a TTL picked at random from [SCORE_TTL * (1 - jitter), SCORE_TTL],
+# so keys written in a burst don't expire in a burst
+SCORE_TTL_JITTER = 0.1
+# XFetch (probabilistic early expiration): a cached score is refreshed before expiry with
+# probability exp(-remaining_ttl / (delta * beta)), rising as expiry nears
+SCORE_REFRESH_DELTA = 60.0
+SCORE_REFRESH_BETA = 1.0
+# Version of score cache keys. Keys of different versions don't overlap, so processes
+# using different versions share Redis during a migration, old keys just expire.
+SCORING_KEY_VERSION = 2
+SCORING_KEY_DIGEST_SIZE = 12
+# v2 key input: lengths of UTF-8 encoded first name, last name and phone, birthday ordinal
+# (0 if unknown), followed by the encoded fields
+SCORING_KEY_HEADER = struct.Struct(">IIII")
+# Migration to interests partitioned by day: clients that have never been written
+# by day are read from their undated "i:{cid}" key. Disabled once all data is partitioned.
+UNDATED_INTERESTS_FALLBACK = True
+
+
+def score_ttl() -> int:
+    return round(SCORE_TTL * (1 - SCORE_TTL_JITTER * random.random()))
+
+
+def score_early_refresh() -> float:
+    """
+    XFetch gap: cached score is refreshed if it expires sooner than this number of seconds.
+    """
+    return -SCORE_REFRESH_DELTA * SCORE_REFRESH_BETA * math.log(1 - random.random())
+
+
+def get_scoring_key_v1(
     first_name: Optional[str] = None,
     last_name: Optional[str] = None,
     phone: Optional[str] = None,
-    birthday: Optional[datetime] = None,
+    birthday: Optional[date] = None,
 ) -> str:
     key_parts = [
         first_name or "",
@@ -21,6 +62,43 @@ def get_scoring_key(
     return "uid:" + hashlib.md5("".join(key_parts).encode("utf-8")).hexdigest()
 
 
+def get_scoring_key_v2(
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    phone: Optional[str] = None,
+    birthday: Optional[date] = None,
+) -> str:
+    """
+    Key is "uid:2:" and base64 of 96-bit BLAKE2b digest of length-prefixed fields,
+    so field boundaries are unambiguous and missing values differ from any given ones.
+    """
+    first = first_name.encode("utf-8") if first_name else b""
+    last = last_name.encode("utf-8") if last_name else b""
+    phone_bytes = str(phone).encode("utf-8") if phone else b""
+    header = SCORING_KEY_HEADER.pack(
+        len(first),
+        len(last),
+        len(phone_bytes),
+        birthday.toordinal() if birthday else 0,
+    )
+    digest = hashlib.blake2b(
+        header + first + last + phone_bytes, digest_size=SCORING_KEY_DIGEST_SIZE
+    ).digest()
+    return "uid:2:" + urlsafe_b64encode(digest).decode("ascii")
+
+
+SCORING_KEYS = {1: get_scoring_key_v1, 2: get_scoring_key_v2}
+
+
+def get_scoring_key(
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    phone: Optional[str] = None,
+    birthday: Optional[date] = None,
+) -> str:
+    return SCORING_KEYS[SCORING_KEY_VERSION](first_name, last_name, phone, birthday)
+
+
 def get_score(
     store: Store,
     phone: Optional[str] = None,
@@ -29,15 +107,12 @@ def get_score(
     gender: Optional[int] = None,
     first_name: Optional[str] = None,
     last_name: Optional[str] = None,
+    use_cache: bool = True,
 ) -> float:
     key = get_scoring_key(first_name, last_name, phone, birthday)
 
-    # Try to get from cache
-    score = store.cache_get(key)
-    if score is not None:
-        return float(score)
-
-    # Calculate score
+    # Score is cheap to calculate, so it's computed upfront and cache is read and
+    # filled in a single store call
     score = 0.0
     if phone:
         score += 1.5
@@ -48,11 +123,251 @@ def get_score(
     if first_name and last_name:
         score += 0.5
 
-    # Cache the score for 60 minutes
-    store.cache_set(key, score, 60 * 60)
+    # Cache the score for about 60 minutes
+    if use_cache:
+        cached = store.cache_get_or_set(
+            key, score, score_ttl(), early_refresh=score_early_refresh()
+        )
+        if cached is not None:
+            return float(cached)
     return score
 
 
-def get_interests(store: Store, cid: str) -> list:
+def daily_interests_key(cid: str | int, day: date) -> str:
+    return f"i:{cid}:d:{day:%Y%m%d}"
+
+
+def monthly_interests_key(cid: str | int, day: date) -> str:
+    return f"i:{cid}:m:{day:%Y%m}"
+
+
+def partitioned_interests_key(cid: str | int) -> str:
+    """
+    Marker of a client whose interests are written by day, it's never removed.
+    """
+    return f"i:{cid}:p"
+
+
+def score_many(
+    phones: Sequence[Any],
+    emails: Sequence[Any],
+    birthdays: Sequence[Any],
+    genders: Sequence[Any],
+    first_names: Sequence[Any],
+    last_names: Sequence[Any],
+) -> list[float]:
+    """
+    Scores of identities given by columns, row by row equal to the ones get_score computes.
+    Vectorised with numpy if it's installed, columns may also be numpy arrays: string
+    arrays have no missing values, object arrays use None like lists do.
+    """
+    if numpy is None:
+        return [
+            1.5 * bool(phone)
+            + 1.5 * bool(email)
+            + 1.5 * bool(birthday and gender is not None)
+            + 0.5 * bool(first_name and last_name)
+            for phone, email, birthday, gender, first_name, last_name in zip(
+                phones, emails, birthdays, genders, first_names, last_names
+            )
+        ]
+
+    count = len(phones)
+
+    def as_array(column: Sequence[Any]) -> Any:
+        if isinstance(column, numpy.ndarray):
+            return column
+        return numpy.fromiter(column, dtype=object, count=count)
+
+    def present(column: Sequence[Any]) -> Any:
+        array = as_array(column)
+        if array.dtype.kind in "US":
+            return numpy.char.str_len(array) > 0
+        return array.astype(bool)
+
+    genders_array = as_array(genders)
+    known_gender = (
+        genders_array != None  # noqa: E711 (element-wise comparison)
+        if genders_array.dtype.kind == "O"
+        else numpy.ones(count, dtype=bool)
+    )
+    # All weights and their sums are exact binary fractions, so the order of additions
+    # doesn't change results
+    scores = (
+        1.5 * present(phones)
+        + 1.5 * present(emails)
+        + 1.5 * (present(birthdays) & known_gender)
+        + 0.5 * (present(first_names) & present(last_names))
+    )
+    return scores.tolist()
+
+
+def get_scoring_keys(
+    first_names: Sequence[Any],
+    last_names: Sequence[Any],
+    phones: Sequence[Any],
+    birthdays: Sequence[Any],
+) -> list[str]:
+    """
+    Cache keys of identities given by columns, row by row equal to get_scoring_key results.
+    """
+    scoring_key = SCORING_KEYS[SCORING_KEY_VERSION]
+    return [
+        scoring_key(first_name, last_name, phone, birthday)
+        for first_name, last_name, phone, birthday in zip(
+            first_names, last_names, phones, birthdays
+        )
+    ]
+
+
+def get_scores(
+    store: Store,
+    phones: Sequence[Any],
+    emails: Sequence[Any],
+    birthdays: Sequence[Any],
+    genders: Sequence[Any],
+    first_names: Sequence[Any],
+    last_names: Sequence[Any],
+    use_cache: bool = True,
+) -> list[float]:
+    """
+    Batch version of get_score for columns of identity fields: scores are computed at once
+    and the cache is read and filled in a single store call.
+    """
+    scores = score_many(phones, emails, birthdays, genders, first_names, last_names)
+    if not use_cache or not scores:
+        return scores
+
+    keys = get_scoring_keys(first_names, last_names, phones, birthdays)
+    cached = store.cache_get_or_set_many(
+        keys,
+        scores,
+        [score_ttl() for _ in keys],
+        [score_early_refresh() for _ in keys],
+    )
+    return [
+        score if value is None else float(value) for score, value in zip(scores, cached)
+    ]
+
+
+def get_interests(store: Store, cid: str, day: Optional[date] = None) -> list:
+    if day is not None:
+        return get_interests_range(store, [cid], day, day)[f"{cid}"]
     r = store.get(f"i:{cid}")
     return json.loads(r) if r else []
+
+
+def get_interests_range(
+    store: Store, cids: list, start: date, end: date
+) -> dict[str, list]:
+    """
+    Read interests of clients for days from start to end inclusive in one store call.
+    Every day is read from its daily partition, or from the monthly blob once compacted,
+    so only partitions overlapping the range are transferred and parsed.
+    With UNDATED_INTERESTS_FALLBACK, clients with nothing in the range are checked for
+    the partitioning marker, and the ones that have never been written by day are read
+    from their undated "i:{cid}" key, two more store calls at most.
+    :return: {client_id: interests} dict, interests of all days without duplicates
+    """
+    days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+    months = sorted({day.replace(day=1) for day in days})
+    keys = []
+    for cid in cids:
+        keys += [daily_interests_key(cid, day) for day in days]
+        keys += [monthly_interests_key(cid, month) for month in months]
+    values = iter(store.get_many(keys))
+
+    result = {}
+    for cid in cids:
+        daily = [next(values) for _ in days]
+        monthly = {
+            month: json.loads(value)
+            for month, value in zip(months, [next(values) for _ in months])
+            if value
+        }
+        interests: dict[str, None] = {}
+        for day, value in zip(days, daily):
+            if value:
+                interests.update(dict.fromkeys(json.loads(value)))
+            else:
+                compacted = monthly.get(day.replace(day=1), {})
+                interests.update(dict.fromkeys(compacted.get(f"{day:%d}", [])))
+        result[f"{cid}"] = list(interests)
+
+    empty = [cid for cid in cids if not result[f"{cid}"]]
+    if UNDATED_INTERESTS_FALLBACK and empty:
+        markers = store.get_many([partitioned_interests_key(cid) for cid in empty])
+        undated = [cid for cid, marker in zip(empty, markers) if not marker]
+        if undated:
+            for cid, value in zip(
+                undated, store.get_many([f"i:{cid}" for cid in undated])
+            ):
+                result[f"{cid}"] = json.loads(value) if value else []
+    return result
+
+
+def set_interests(store: Store, cid: str | int, interests: list, day: date):
+    store.set(daily_interests_key(cid, day), json.dumps(interests))
+    store.set(partitioned_interests_key(cid), "1")
+
+
+def compact_interests(store: Store, before: date) -> int:
+    """
+    Roll daily partitions of months before the given date's month into monthly blobs
+    {"DD": interests}. Monthly blob is written before daily keys are removed, so an
+    interrupted compaction is safely repeated.
+    :return: Number of compacted daily partitions
+    """
+    boundary = f"{before:%Y%m}"
+    partitions: dict[tuple[str, str], list[str]] = defaultdict(list)
+    for key in store.scan("i:*:d:*"):
+        cid, _, day = key[len("i:") :].rpartition(":d:")
+        if len(day) == 8 and day[:6] < boundary:
+            partitions[(cid, day[:6])].append(key)
+
+    compacted = 0
+    for (cid, month), keys in partitions.items():
+        keys = sorted(set(keys))
+        monthly_key = f"i:{cid}:m:{month}"
+        current, *values = store.get_many([monthly_key, *keys])
+        blob = json.loads(current) if current else {}
+        for key, value in zip(keys, values):
+            if value:
+                blob[key[-2:]] = json.loads(value)
+        store.set(monthly_key, json.dumps(blob, sort_keys=True))
+        store.delete(keys)
+        compacted += len(keys)
+    return compacted
+
+
+def get_interests_many(store: Store, cids: list) -> dict[str, list]:
+    """
+    Read interests of clients in one store call.
+    :return: {client_id: interests} dict
+    """
+    names = [f"{cid}" for cid in cids]
+    return json.loads(
+        store.get_many_json([f"i:{cid}" for cid in cids], names, default="[]")
+    )
+
+
+def iter_interests(
+    store: Store,
+    cids: list,
+    chunk_size: int = INTERESTS_CHUNK_SIZE,
+    day: Optional[date] = None,
+) -> Iterator[dict[str, list]]:
+    """
+    Read interests of clients chunk by chunk, one store call per chunk.
+    :param store: KV-store
+    :param cids: Client ids
+    :param chunk_size: Number of clients read at once
+    :param day: Read only interests of this day, whole history if not set
+    :return: Iterator of {client_id: interests} dicts
+    """
+    for i in range(0, len(cids), chunk_size):
+        chunk = cids[i : i + chunk_size]
+        if day is None:
+            yield get_interests_many(store, chunk)
+        else:
+            yield get_interests_range(store, chunk, day, day)
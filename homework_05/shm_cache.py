@@ -0,0 +1,294 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Iterator
+
+from homework_05.local_cache import MISSING
+from homework_05.store import Store
+
+MAGIC = b"HW05SHM1"
+HEADER = struct.Struct("<8sIIII")
+# seq, key hash, expires at (unix time), key length, value length, flags
+SLOT_HEADER = struct.Struct("<IQdHIB")
+SLOT_HEADER_SIZE = 32
+ASSOCIATIVITY = 8
+FLAG_NONE = 1
+READ_ATTEMPTS = 8
+
+
+class SharedMemoryCache:
+    """
+    Fixed-size hash table with TTL in a memory-mapped file, shared by all processes
+    opening the same path. Keys are hashed to a group of ASSOCIATIVITY slots and probed
+    linearly inside the group; a full group evicts the entry closest to expiry.
+    Writers of a group hold a striped lock (fcntl byte-range lock between processes plus
+    a thread lock inside a process). Readers take no locks: every slot is a seqlock,
+    the sequence number is odd during a write and a read is retried if it changed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        slots: int = 65_536,
+        max_key_size: int = 64,
+        max_value_size: int = 256,
+        stripes: int = 64,
+    ):
+        groups = max(1, slots // ASSOCIATIVITY)
+        self.path = path
+        self.groups = groups
+        self.slots = groups * ASSOCIATIVITY
+        self.max_key_size = max_key_size
+        self.max_value_size = max_value_size
+        self.slot_size = SLOT_HEADER_SIZE + max_key_size + max_value_size
+        self.stripes = stripes
+        self.__thread_locks = [threading.Lock() for _ in range(stripes)]
+        size = HEADER.size + self.slots * self.slot_size
+
+        self.__fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self.__fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self.__fd).st_size != size or not self.__is_compatible():
+                os.ftruncate(self.__fd, 0)
+                os.ftruncate(self.__fd, size)
+                os.pwrite(
+                    self.__fd,
+                    HEADER.pack(
+                        MAGIC, self.slots, self.slot_size, max_key_size, max_value_size
+                    ),
+                    0,
+                )
+            self.__mmap = mmap.mmap(self.__fd, size)
+        finally:
+            fcntl.lockf(self.__fd, fcntl.LOCK_UN)
+
+    def __is_compatible(self) -> bool:
+        header = os.pread(self.__fd, HEADER.size, 0)
+        return header == HEADER.pack(
+            MAGIC, self.slots, self.slot_size, self.max_key_size, self.max_value_size
+        )
+
+    def close(self):
+        self.__mmap.close()
+        os.close(self.__fd)
+
+    @staticmethod
+    def hash(key: bytes) -> int:
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest()) | 1
+
+    def __slot_offset(self, slot: int) -> int:
+        return HEADER.size + slot * self.slot_size
+
+    def __read_slot(self, offset: int) -> tuple[int, int, float, bytes, bytes, int]:
+        """
+        Consistent copy of slot: (seq, hash, expires, key, value, flags).
+        Hash is 0 if slot was not read consistently.
+        """
+        for _ in range(READ_ATTEMPTS):
+            seq, key_hash, expires, key_size, value_size, flags = (
+                SLOT_HEADER.unpack_from(self.__mmap, offset)
+            )
+            if seq & 1:
+                continue
+            start = offset + SLOT_HEADER_SIZE
+            key = self.__mmap[start : start + min(key_size, self.max_key_size)]
+            start += self.max_key_size
+            value = self.__mmap[start : start + min(value_size, self.max_value_size)]
+            if struct.unpack_from("<I", self.__mmap, offset)[0] == seq:
+                return seq, key_hash, expires, key, value, flags
+        return 0, 0, 0.0, b"", b"", 0
+
+    def get(self, key: bytes) -> Any:
+        """
+        Get value.
+        :param key: Key to search
+        :return: Stored bytes, None if None was stored or MISSING
+        """
+        key_hash = self.hash(key)
+        group = key_hash % self.groups
+        now = time.time()
+        for slot in range(group * ASSOCIATIVITY, (group + 1) * ASSOCIATIVITY):
+            _, slot_hash, expires, slot_key, value, flags = self.__read_slot(
+                self.__slot_offset(slot)
+            )
+            if slot_hash == key_hash and slot_key == key:
+                if expires <= now:
+                    return MISSING
+                return None if flags & FLAG_NONE else value
+        return MISSING
+
+    def set(self, key: bytes, value: bytes | None, ttl: float) -> bool:
+        """
+        Put value to cache.
+        :param key: Key to store
+        :param value: Bytes value or None
+        :param ttl: Time to live in seconds
+        :return: False if key or value doesn't fit into a slot
+        """
+        if len(key) > self.max_key_size or len(value or b"") > self.max_value_size:
+            return False
+        key_hash = self.hash(key)
+        group = key_hash % self.groups
+        stripe = group % self.stripes
+        with self.__thread_locks[stripe]:
+            fcntl.lockf(self.__fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                self.__write(group, key_hash, key, value, time.time() + ttl)
+            finally:
+                fcntl.lockf(self.__fd, fcntl.LOCK_UN, 1, stripe)
+        return True
+
+    def __write(
+        self, group: int, key_hash: int, key: bytes, value: bytes | None, expires: float
+    ):
+        now = time.time()
+        target = None
+        target_expires = float("inf")
+        for slot in range(group * ASSOCIATIVITY, (group + 1) * ASSOCIATIVITY):
+            offset = self.__slot_offset(slot)
+            _, slot_hash, slot_expires, slot_key_size, _, _ = SLOT_HEADER.unpack_from(
+                self.__mmap, offset
+            )
+            start = offset + SLOT_HEADER_SIZE
+            if slot_hash == key_hash and (
+                self.__mmap[start : start + slot_key_size] == key
+            ):
+                target = offset
+                break
+            if slot_hash == 0 or slot_expires <= now:
+                slot_expires = 0.0
+            if slot_expires < target_expires:
+                target, target_expires = offset, slot_expires
+        assert target is not None
+
+        seq = struct.unpack_from("<I", self.__mmap, target)[0]
+        struct.pack_into("<I", self.__mmap, target, seq + 1)
+        start = target + SLOT_HEADER_SIZE
+        self.__mmap[start : start + len(key)] = key
+        start += self.max_key_size
+        if value:
+            self.__mmap[start : start + len(value)] = value
+        SLOT_HEADER.pack_into(
+            self.__mmap,
+            target,
+            seq + 1,
+            key_hash,
+            expires,
+            len(key),
+            len(value or b""),
+            FLAG_NONE if value is None else 0,
+        )
+        struct.pack_into("<I", self.__mmap, target, (seq + 2) & 0xFFFFFFFF)
+
+    def delete(self, key: bytes):
+        self.set(key, None, -1)
+
+
+class SharedCacheStore(Store):
+    """
+    Store wrapper caching values in SharedMemoryCache, so workers on a host share one warm cache.
+    Values read from the wrapped store are kept for `ttl` seconds. The cache is TTL-only: it isn't
+    invalidated by Redis tracking, changes made elsewhere are visible after at most `ttl` seconds.
+    """
+
+    def __init__(self, store: Store, cache: SharedMemoryCache, ttl: int = 60):
+        self.store = store
+        self.cache = cache
+        self.ttl = ttl
+
+    @staticmethod
+    def encode(value: Any) -> bytes | None:
+        if value is None or isinstance(value, bytes):
+            return value
+        # Same encoding Redis client uses for stored values
+        return str(value).encode("utf-8")
+
+    def __cached(self, key: str, read) -> Any:
+        local_key = key.encode("utf-8")
+        value = self.cache.get(local_key)
+        if value is not MISSING:
+            return value
+        value = read(key)
+        self.cache.set(local_key, self.encode(value), self.ttl)
+        return value
+
+    def ping(self):
+        self.store.ping()
+
+    def get(self, key: str) -> Any:
+        return self.__cached(key, self.store.get)
+
+    def get_many(self, keys: list[str]) -> list[Any]:
+        values = [self.cache.get(key.encode("utf-8")) for key in keys]
+        missed = [i for i, value in enumerate(values) if value is MISSING]
+        if missed:
+            found = self.store.get_many([keys[i] for i in missed])
+            for i, value in zip(missed, found):
+                values[i] = value
+                self.cache.set(keys[i].encode("utf-8"), self.encode(value), self.ttl)
+        return values
+
+    def cache_get(self, key: str) -> Any:
+        return self.__cached(key, self.store.cache_get)
+
+    def cache_get_or_set(
+        self, key: str, value: Any, ttl: int = 60, early_refresh: float = 0.0
+    ) -> Any:
+        cached = self.cache.get(key.encode("utf-8"))
+        if cached is not MISSING and cached is not None:
+            return cached
+        cached = self.store.cache_get_or_set(key, value, ttl, early_refresh)
+        self.cache.set(
+            key.encode("utf-8"),
+            self.encode(value if cached is None else cached),
+            min(ttl, self.ttl),
+        )
+        return cached
+
+    def cache_get_or_set_many(
+        self,
+        keys: list[str],
+        values: list[Any],
+        ttls: list[int],
+        early_refresh: list[float] | None = None,
+    ) -> list[Any]:
+        cached = [self.cache.get(key.encode("utf-8")) for key in keys]
+        missed = [
+            i for i, value in enumerate(cached) if value is MISSING or value is None
+        ]
+        if missed:
+            found = self.store.cache_get_or_set_many(
+                [keys[i] for i in missed],
+                [values[i] for i in missed],
+                [ttls[i] for i in missed],
+                [early_refresh[i] for i in missed] if early_refresh else None,
+            )
+            for i, value in zip(missed, found):
+                cached[i] = value
+                self.cache.set(
+                    keys[i].encode("utf-8"),
+                    self.encode(values[i] if value is None else value),
+                    min(ttls[i], self.ttl),
+                )
+        return cached
+
+    def cache_set(self, key: str, value: Any, ttl: int = 60):
+        self.store.cache_set(key, value, ttl)
+        self.cache.set(key.encode("utf-8"), self.encode(value), min(ttl, self.ttl))
+
+    def set(self, key: str, value: Any):
+        self.store.set(key, value)
+        self.cache.delete(key.encode("utf-8"))
+
+    def delete(self, keys: list[str]):
+        self.store.delete(keys)
+        for key in keys:
+            self.cache.delete(key.encode("utf-8"))
+
+    def scan(self, pattern: str) -> Iterator[str]:
+        return self.store.scan(pattern)
@@ -1,14 +1,59 @@
 import abc
+import json
 import logging
-from typing import Any
+import threading
+import time
+from typing import Any, Callable, Iterator, TypeVar
 
-from redis.backoff import ExponentialBackoff
+from redis.backoff import ExponentialBackoff, NoBackoff
 from redis.retry import Retry
 import redis
 from redis.exceptions import BusyLoadingError, ConnectionError, TimeoutError
 
+from homework_05.local_cache import MISSING, LocalCache, restore_snapshot
+from homework_05.tracing import tracer
+
 logger = logging.getLogger()
 
+T = TypeVar("T")
+
+REPLICA_ERRORS = (BusyLoadingError, ConnectionError, TimeoutError)
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+TRACKED_PREFIXES = ("i:", "uid:")
+
+
+# Scripts are loaded once and called with EVALSHA, redis client reloads them on NOSCRIPT
+# (e.g. after Redis restart)
+CACHE_GET_OR_SET_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+if value then
+    -- Early refresh: value expiring within ARGV[3] milliseconds is replaced
+    local ttl = redis.call('PTTL', KEYS[1])
+    if ttl < 0 or ttl > tonumber(ARGV[3]) then
+        return value
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return false
+"""
+MGET_JSON_SCRIPT = """#!lua flags=no-writes
+local values = redis.call('MGET', unpack(KEYS))
+local parts = {}
+for i = 1, #KEYS do
+    local value = values[i]
+    -- Empty string is truthy in Lua, but isn't valid JSON
+    if not value or value == '' then
+        value = ARGV[1]
+    end
+    parts[i] = cjson.encode(ARGV[i + 1]) .. ':' .. value
+end
+return '{' .. table.concat(parts, ',') .. '}'
+"""
+
+
+def to_bytes(key: str | bytes) -> bytes:
+    return key.encode("utf-8") if isinstance(key, str) else key
+
 
 class Store(abc.ABC):
     @abc.abstractmethod
@@ -37,6 +82,260 @@ class Store(abc.ABC):
         :return: None
         """
 
+    def get_many(self, keys: list[str]) -> list[Any]:
+        """
+        Get values from KV-store in a single call. If store is unavailable raises an error
+        :param keys: String keys to search
+        :return: Found values in order of keys, None for missing keys
+        """
+        return [self.get(key) for key in keys]
+
+    def get_many_json(
+        self, keys: list[str], names: list[str], default: str = "null"
+    ) -> bytes:
+        """
+        Get JSON encoded values from KV-store as one JSON object. If store is unavailable raises an error
+        :param keys: String keys to search, stored values must be valid JSON
+        :param names: Names of values in resulting object, in order of keys
+        :param default: JSON to use for missing keys
+        :return: UTF-8 encoded JSON object
+        """
+        parts = []
+        for name, value in zip(names, self.get_many(keys)):
+            if isinstance(value, bytes):
+                value = value.decode("utf-8")
+            parts.append(f"{json.dumps(name)}:{value or default}")
+        return ("{" + ",".join(parts) + "}").encode("utf-8")
+
+    def cache_get_or_set(
+        self, key: str, value: Any, ttl: int = 60, early_refresh: float = 0.0
+    ) -> Any:
+        """
+        Get cached value from store, preserve given value if there is no cached one.
+        :param key: String key to search
+        :param value: Value to store at cache if key is missing
+        :param ttl: Time to life of stored value
+        :param early_refresh: Replace cached value if it expires within given number of seconds.
+                              Ignored by stores which can't tell the remaining TTL.
+        :return: Found value or None if given value is stored
+        """
+        cached = self.cache_get(key)
+        if cached is not None:
+            return cached
+        self.cache_set(key, value, ttl)
+        return None
+
+    def cache_get_or_set_many(
+        self,
+        keys: list[str],
+        values: list[Any],
+        ttls: list[int],
+        early_refresh: list[float] | None = None,
+    ) -> list[Any]:
+        """
+        Batch version of cache_get_or_set, arguments are given per key.
+        :return: Found values or None where given value is stored, in order of keys
+        """
+        return [
+            self.cache_get_or_set(key, value, ttl, refresh)
+            for key, value, ttl, refresh in zip(
+                keys, values, ttls, early_refresh or [0.0] * len(keys)
+            )
+        ]
+
+    def ping(self):
+        """
+        Check store availability. If store is unavailable raises an error
+        :return: None
+        """
+
+    @abc.abstractmethod
+    def set(self, key: str, value: Any):
+        """
+        Put value to KV-store without expiration. If store is unavailable raises an error
+        :param key: String key
+        :param value: Value to store
+        :return: None
+        """
+
+    @abc.abstractmethod
+    def delete(self, keys: list[str]):
+        """
+        Remove keys from KV-store. If store is unavailable raises an error
+        :param keys: String keys to remove, missing keys are ignored
+        :return: None
+        """
+
+    @abc.abstractmethod
+    def scan(self, pattern: str) -> Iterator[str]:
+        """
+        Iterate over KV-store keys. If store is unavailable raises an error
+        :param pattern: Glob-style pattern keys should match
+        :return: Iterator of matching keys, a key may be returned more than once
+        """
+
+
+class Replica:
+    def __init__(self, name: str, client: redis.Redis):
+        self.name = name
+        self.client = client
+        self.outstanding = 0
+        self.down_until = 0.0
+
+
+class ReplicaPool:
+    """
+    Picks a read replica with the least outstanding requests (round-robin on ties).
+    Failed replicas are taken out of rotation for `cooldown` seconds and tried again after that.
+    """
+
+    def __init__(self, replicas: list[Replica], cooldown: float = 5.0):
+        self.replicas = replicas
+        self.cooldown = cooldown
+        self.__lock = threading.Lock()
+        self.__next = 0
+
+    def acquire(self) -> Replica | None:
+        now = time.monotonic()
+        with self.__lock:
+            count = len(self.replicas)
+            chosen: Replica | None = None
+            for i in range(count):
+                replica = self.replicas[(self.__next + i) % count]
+                if replica.down_until > now:
+                    continue
+                if chosen is None or replica.outstanding < chosen.outstanding:
+                    chosen = replica
+            if chosen is None:
+                return None
+            self.__next = (self.replicas.index(chosen) + 1) % count
+            chosen.outstanding += 1
+            return chosen
+
+    def release(self, replica: Replica):
+        with self.__lock:
+            replica.outstanding -= 1
+
+    def mark_down(self, replica: Replica):
+        with self.__lock:
+            replica.down_until = time.monotonic() + self.cooldown
+
+
+class TrackingInvalidator:
+    """
+    Keeps LocalCache coherent with Redis using server-assisted client side caching:
+    a tracker connection enables CLIENT TRACKING in broadcasting mode for given prefixes
+    and redirects invalidation messages to a RESP2 pub/sub listener connection.
+    Local cache is flushed when tracking is (re)established or lost and must not be used
+    while `active` is False. When tracking is established for the first time, the cache is
+    warmed from `snapshot` file: invalidations missed during downtime can't be replayed, so
+    restored values may be stale for up to the cache TTL, just like replica reads.
+    """
+
+    def __init__(
+        self,
+        connection_kwargs: dict,
+        cache: LocalCache,
+        prefixes: tuple[str, ...] = TRACKED_PREFIXES,
+        reconnect_delay: float = 1.0,
+        snapshot: str | None = None,
+    ):
+        self.cache = cache
+        self.snapshot = snapshot
+        self.prefixes = prefixes
+        self.reconnect_delay = reconnect_delay
+        self.active = False
+        self.lag = {"count": 0, "last": 0.0, "max": 0.0, "total": 0.0}
+        self.__connection_kwargs = connection_kwargs
+        self.__pending_writes: dict[bytes, float] = {}
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(
+            target=self.run, name="redis-tracking", daemon=True
+        )
+
+    def start(self):
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        self.__thread.join()
+
+    def track_write(self, key: bytes):
+        """
+        Remember time of own write to measure invalidation lag for the key.
+        """
+        if len(self.__pending_writes) > self.cache.max_size:
+            self.__pending_writes.clear()
+        self.__pending_writes[key] = time.monotonic()
+
+    def handle_message(self, message: Any):
+        if not isinstance(message, list) or len(message) < 3:
+            return
+        if message[0] != b"message":
+            return
+        keys = message[2]
+        if keys is None:
+            # Tracking table flush (FLUSHALL/FLUSHDB or memory pressure on server side)
+            self.cache.clear()
+            return
+
+        self.cache.invalidate(keys)
+        now = time.monotonic()
+        for key in keys:
+            written_at = self.__pending_writes.pop(key, None)
+            if written_at is None:
+                continue
+            lag = now - written_at
+            self.lag["count"] += 1
+            self.lag["last"] = lag
+            self.lag["max"] = max(self.lag["max"], lag)
+            self.lag["total"] += lag
+
+    def connect(self) -> tuple[redis.Connection, redis.Connection]:
+        listener = redis.Connection(**self.__connection_kwargs)
+        listener.send_command("CLIENT", "ID")
+        listener_id = listener.read_response()
+        listener.send_command("SUBSCRIBE", INVALIDATE_CHANNEL)
+        listener.read_response()
+
+        tracker = redis.Connection(**self.__connection_kwargs)
+        command: list[Any] = ["CLIENT", "TRACKING", "ON", "REDIRECT", listener_id]
+        command.append("BCAST")
+        for prefix in self.prefixes:
+            command += ["PREFIX", prefix]
+        tracker.send_command(*command)
+        tracker.read_response()
+        return listener, tracker
+
+    def run(self):
+        while not self.__stop.is_set():
+            connections: tuple[redis.Connection, ...] = ()
+            try:
+                connections = listener, tracker = self.connect()
+                self.cache.clear()
+                if self.snapshot is not None:
+                    restored = restore_snapshot(self.cache, self.snapshot)
+                    logger.info(f"Local cache is warmed with {restored} entries")
+                    # Snapshot is older than anything cached after a reconnect
+                    self.snapshot = None
+                self.active = True
+                logger.info("Redis client side cache tracking is enabled")
+                while not self.__stop.is_set():
+                    if listener.can_read(timeout=self.reconnect_delay):
+                        self.handle_message(listener.read_response())
+                    else:
+                        # Tracking is bound to tracker connection, make sure it's alive
+                        tracker.send_command("PING")
+                        tracker.read_response()
+            except Exception as e:
+                logger.error(f"Redis client side cache tracking is lost: {e}")
+            finally:
+                self.active = False
+                self.cache.clear()
+                for connection in connections:
+                    connection.disconnect()
+            self.__stop.wait(self.reconnect_delay)
+
 
 class RedisStore(Store):
     def __init__(
@@ -45,22 +344,116 @@ class RedisStore(Store):
         port: int = 6379,
         password: str | None = None,
         db: int = 0,
+        replicas: list[tuple[str, int]] | None = None,
+        replica_cooldown: float = 5.0,
+        local_cache: LocalCache | None = None,
+        local_cache_snapshot: str | None = None,
     ):
-        retry = Retry(ExponentialBackoff(), 3)
         self.__redis = redis.Redis(
             host=host,
             port=port,
             db=db,
             password=password,
-            retry=retry,
+            retry=Retry(ExponentialBackoff(), 3),
             retry_on_error=[BusyLoadingError, ConnectionError, TimeoutError],
             socket_connect_timeout=10,
             retry_on_timeout=True,
         )
+        # Health checks must not wait for retries, their failures are the signal
+        self.__health_check = redis.Redis(
+            host=host,
+            port=port,
+            db=db,
+            password=password,
+            retry=Retry(NoBackoff(), 0),
+            socket_connect_timeout=1,
+            socket_timeout=1,
+        )
+        # Replicas fail fast: on error the read is served by the primary instead of retrying.
+        self.__replicas = ReplicaPool(
+            [
+                Replica(
+                    f"{replica_host}:{replica_port}",
+                    redis.Redis(
+                        host=replica_host,
+                        port=replica_port,
+                        db=db,
+                        password=password,
+                        retry=Retry(NoBackoff(), 0),
+                        socket_connect_timeout=1,
+                    ),
+                )
+                for replica_host, replica_port in replicas or []
+            ],
+            cooldown=replica_cooldown,
+        )
+        self.__local_cache = local_cache
+        self.__invalidator: TrackingInvalidator | None = None
+        if local_cache is not None:
+            self.__invalidator = TrackingInvalidator(
+                self.__redis.connection_pool.connection_kwargs,
+                local_cache,
+                snapshot=local_cache_snapshot,
+            )
+            self.__invalidator.start()
+        self.__cache_get_or_set = self.__redis.register_script(CACHE_GET_OR_SET_SCRIPT)
+        self.__mget_json = self.__redis.register_script(MGET_JSON_SCRIPT)
 
-    def get(self, key: str) -> bytes | None:
+    def local_cache_stats(self) -> dict | None:
+        if self.__local_cache is None or self.__invalidator is None:
+            return None
+        return self.__local_cache.stats() | {
+            "tracking": self.__invalidator.active,
+            "invalidation_lag": self.__invalidator.lag,
+        }
+
+    @property
+    def local_cache_active(self) -> bool:
+        """
+        Local cache is tracked and, if a snapshot is given, already warmed from it.
+        """
+        return self.__local_cache_available()
+
+    def __local_cache_available(self) -> bool:
+        return self.__invalidator is not None and self.__invalidator.active
+
+    def __read_through(self, key: str, read: Callable[[bool], Any]) -> Any:
+        """
+        :param read: Store read, called with True if it must be done on the primary
+        """
+        if self.__local_cache is None or not self.__local_cache_available():
+            return read(False)
+        local_key = to_bytes(key)
+        value = self.__local_cache.get(local_key)
+        if value is not MISSING:
+            return value
+        epoch = self.__local_cache.epoch
+        # Values cached locally are read from the primary: a lagging replica may return
+        # a value older than an invalidation already received, it would stay cached
+        value = read(True)
+        self.__local_cache.set(local_key, value, epoch=epoch)
+        return value
+
+    def __read(self, operation: Callable[[redis.Redis], T], primary: bool = False) -> T:
+        if primary:
+            return operation(self.__redis)
+        replica = self.__replicas.acquire()
+        if replica is None:
+            return operation(self.__redis)
         try:
-            return self.__redis.get(key)
+            return operation(replica.client)
+        except REPLICA_ERRORS as e:
+            logger.warning(f"Replica {replica.name} is unavailable, using primary: {e}")
+            self.__replicas.mark_down(replica)
+        finally:
+            self.__replicas.release(replica)
+        return operation(self.__redis)
+
+    def __strict_read(
+        self, operation: Callable[[redis.Redis], T], primary: bool = False
+    ) -> T:
+        try:
+            return self.__read(operation, primary)
         except BusyLoadingError as e:
             logger.error(e)
             raise BusyLoadingError(f"Redis server is too busy. Error: {e}") from e
@@ -73,15 +466,148 @@ class RedisStore(Store):
                 f"Redis server connection is timed out. Error: {e}"
             ) from e
 
+    def ping(self):
+        self.__health_check.ping()
+
+    def get(self, key: str) -> bytes | None:
+        with tracer.span("redis.get"):
+            return self.__read_through(
+                key,
+                lambda primary: self.__strict_read(
+                    lambda client: client.get(key), primary
+                ),
+            )
+
+    def get_many(self, keys: list[str]) -> list[bytes | None]:
+        if self.__local_cache is None or not self.__local_cache_available():
+            with tracer.span("redis.mget", nkeys=len(keys)):
+                return self.__strict_read(lambda client: client.mget(keys))
+
+        values = [self.__local_cache.get(to_bytes(key)) for key in keys]
+        missed = [i for i, value in enumerate(values) if value is MISSING]
+        if missed:
+            epoch = self.__local_cache.epoch
+            missed_keys = [keys[i] for i in missed]
+            with tracer.span("redis.mget", nkeys=len(missed_keys)):
+                found = self.__strict_read(
+                    lambda client: client.mget(missed_keys), primary=True
+                )
+            for i, value in zip(missed, found):
+                values[i] = value
+                self.__local_cache.set(to_bytes(keys[i]), value, epoch=epoch)
+        return values
+
+    def get_many_json(
+        self, keys: list[str], names: list[str], default: str = "null"
+    ) -> bytes:
+        if not keys:
+            return b"{}"
+        if self.__local_cache_available():
+            # Values are served from local cache where possible
+            return super().get_many_json(keys, names, default)
+        with tracer.span("redis.mget_json", nkeys=len(keys)):
+            return self.__strict_read(
+                lambda client: self.__mget_json(
+                    keys=keys, args=[default, *names], client=client
+                )
+            )
+
+    def cache_get_or_set(
+        self, key: str, value: Any, ttl: int = 60, early_refresh: float = 0.0
+    ) -> bytes | None:
+        if self.__local_cache is not None and self.__local_cache_available():
+            cached = self.__local_cache.get(to_bytes(key))
+            if cached is not MISSING and cached is not None:
+                return cached
+        try:
+            with tracer.span("redis.cache_get_or_set"):
+                return self.__cache_get_or_set(
+                    keys=[key], args=[value, ttl, int(early_refresh * 1000)]
+                )
+        except Exception as e:
+            logger.error(f"Error on get or set cached value for key '{key}': {e}")
+            return None
+
+    def cache_get_or_set_many(
+        self,
+        keys: list[str],
+        values: list[Any],
+        ttls: list[int],
+        early_refresh: list[float] | None = None,
+    ) -> list[bytes | None]:
+        cached: list[bytes | None] = [None] * len(keys)
+        missed = list(range(len(keys)))
+        if self.__local_cache is not None and self.__local_cache_available():
+            missed = []
+            for i, key in enumerate(keys):
+                value = self.__local_cache.get(to_bytes(key))
+                if value is MISSING or value is None:
+                    missed.append(i)
+                else:
+                    cached[i] = value
+        if not missed:
+            return cached
+        early_refresh = early_refresh or [0.0] * len(keys)
+        try:
+            with tracer.span("redis.cache_get_or_set_many", nkeys=len(missed)):
+                # Script calls are sent in one round trip, the pipeline loads the
+                # script first if Redis doesn't know it
+                pipe = self.__redis.pipeline(transaction=False)
+                for i in missed:
+                    self.__cache_get_or_set(
+                        keys=[keys[i]],
+                        args=[values[i], ttls[i], int(early_refresh[i] * 1000)],
+                        client=pipe,
+                    )
+                for i, value in zip(missed, pipe.execute()):
+                    cached[i] = value
+        except Exception as e:
+            logger.error(f"Error on get or set {len(missed)} cached values: {e}")
+        return cached
+
     def cache_get(self, key: str) -> bytes | None:
         try:
-            return self.__redis.get(key)
+            with tracer.span("redis.cache_get"):
+                return self.__read_through(
+                    key,
+                    lambda primary: self.__read(
+                        lambda client: client.get(key), primary
+                    ),
+                )
         except Exception as e:
             logger.error(f"Error on get cached value for key '{key}': {e}")
             return None
 
     def cache_set(self, key: str, value: Any, ttl: int = 60):
         try:
-            self.__redis.set(key, value, ex=ttl)
+            if self.__invalidator is not None:
+                self.__invalidator.track_write(to_bytes(key))
+            with tracer.span("redis.cache_set"):
+                self.__redis.set(key, value, ex=ttl)
+            if self.__local_cache is not None:
+                self.__local_cache.invalidate([to_bytes(key)])
         except Exception as e:
             logger.error(f"Error on preserve cached value for key '{key}': {e}")
+
+    def set(self, key: str, value: Any):
+        if self.__invalidator is not None:
+            self.__invalidator.track_write(to_bytes(key))
+        with tracer.span("redis.set"):
+            self.__redis.set(key, value)
+        if self.__local_cache is not None:
+            self.__local_cache.invalidate([to_bytes(key)])
+
+    def delete(self, keys: list[str]):
+        if not keys:
+            return
+        if self.__invalidator is not None:
+            for key in keys:
+                self.__invalidator.track_write(to_bytes(key))
+        with tracer.span("redis.delete", nkeys=len(keys)):
+            self.__redis.delete(*keys)
+        if self.__local_cache is not None:
+            self.__local_cache.invalidate([to_bytes(key) for key in keys])
+
+    def scan(self, pattern: str, count: int = 1000) -> Iterator[str]:
+        for key in self.__redis.scan_iter(match=pattern, count=count):
+            yield key.decode("utf-8") if isinstance(key, bytes) else key
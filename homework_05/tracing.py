@@ -0,0 +1,165 @@
+import collections
+import contextvars
+import os
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Any
+
+request_id_var: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "request_id", default=None
+)
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def tag(self, **args):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, args: dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.record(self.name, self.start, end, self.args)
+        return False
+
+    def tag(self, **args):
+        self.args.update(args)
+
+
+class Tracer:
+    """
+    Collects per-request stage spans in a bounded buffer. Disabled tracer hands out
+    a shared no-op span, so instrumented code pays only for an attribute check.
+    """
+
+    def __init__(self, enabled: bool = False, capacity: int = 100_000):
+        self.enabled = enabled
+        self.__events: collections.deque[dict] = collections.deque(maxlen=capacity)
+
+    def span(self, name: str, **args) -> Span | NullSpan:
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def record(self, name: str, start_ns: int, end_ns: int, args: dict[str, Any]):
+        request_id = request_id_var.get()
+        if request_id is not None:
+            args["request_id"] = request_id
+        self.__events.append(
+            {
+                "name": name,
+                "ph": "X",
+                "ts": start_ns / 1000,
+                "dur": (end_ns - start_ns) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+    def export(self, request_id: str | None = None) -> dict:
+        """
+        Export collected spans in Chrome trace format (chrome://tracing, Perfetto).
+        :param request_id: Export only spans of given request
+        :return: Trace JSON object
+        """
+        events = [
+            event
+            for event in list(self.__events)
+            if request_id is None or event["args"].get("request_id") == request_id
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def clear(self):
+        self.__events.clear()
+
+
+class ProfilerBusyError(Exception):
+    pass
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a live process: periodically samples stacks of all threads
+    except the calling one. Costs nothing while no capture is running.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def frame_name(frame: FrameType) -> str:
+        code = frame.f_code
+        return f"{code.co_filename}:{code.co_name}:{frame.f_lineno}"
+
+    def capture(self, seconds: float, limit: int = 50) -> dict:
+        """
+        Sample stacks for given period.
+        :param seconds: Capture duration
+        :param limit: Number of top functions and stacks to return
+        :return: Profile stats
+        """
+        if not self.__lock.acquire(blocking=False):
+            raise ProfilerBusyError("Profiling is already in progress")
+        try:
+            own_thread = threading.get_ident()
+            self_counts: collections.Counter[str] = collections.Counter()
+            total_counts: collections.Counter[str] = collections.Counter()
+            stacks: collections.Counter[str] = collections.Counter()
+            samples = 0
+            started = time.monotonic()
+            deadline = started + seconds
+            while time.monotonic() < deadline:
+                for thread_id, top_frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    stack = []
+                    frame: FrameType | None = top_frame
+                    while frame is not None:
+                        stack.append(self.frame_name(frame))
+                        frame = frame.f_back
+                    samples += 1
+                    self_counts[stack[0]] += 1
+                    total_counts.update(set(stack))
+                    stacks[";".join(reversed(stack))] += 1
+                time.sleep(self.interval)
+        finally:
+            self.__lock.release()
+
+        return {
+            "duration": time.monotonic() - started,
+            "interval": self.interval,
+            "samples": samples,
+            "functions": [
+                {"function": name, "self": count, "total": total_counts[name]}
+                for name, count in self_counts.most_common(limit)
+            ],
+            "stacks": dict(stacks.most_common(limit)),
+        }
+
+
+tracer = Tracer()
+profiler = SamplingProfiler()
@@ -89,6 +89,9 @@ class EmailField(BaseField):
 
 class PhoneField(BaseField):
     def prepare(self, value):
+        if not value or value == UnknownState:
+            return None
+
         return str(value)
 
     def validate(self, value):
@@ -143,6 +146,15 @@ class GenderField(BaseField):
             raise ValueError(f"Gender must be one of this {GENDERS} or empty")
 
 
+class PositiveIntField(BaseField):
+    def validate(self, value):
+        if value is None or value == UnknownState:
+            return
+
+        if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+            raise ValueError("Field value should be positive integer")
+
+
 class ClientIDsField(BaseField):
     def validate(self, value):
         if not isinstance(value, list) or not any([isinstance(i, int) for i in value]):
@@ -3,7 +3,7 @@ import datetime
 import pytest
 from testcontainers.redis import RedisContainer
 
-from homework_05.scoring import get_scoring_key, get_score
+from homework_05.scoring import get_scoring_key, get_score, iter_interests
 from homework_05.store import RedisStore
 from redis.exceptions import ConnectionError
 
@@ -64,3 +64,55 @@ def test_scoring_get_score_can_work_if_redis_is_unavailable():
     assert score > 0
     with pytest.raises(ConnectionError):
         redis_store.get(key)
+
+
+@pytest.mark.skip_integration_test_if_not_enabled()
+def test_store_cache_get_or_set(redis_store):
+    assert redis_store.cache_get_or_set("key", "first", 3600) is None
+    assert redis_store.cache_get_or_set("key", "second", 3600) == b"first"
+
+
+@pytest.mark.skip_integration_test_if_not_enabled()
+def test_store_get_many_json(redis_store):
+    redis_store.cache_set("i:1", '["a", "b"]', 3600)
+    assert redis_store.get_many_json(["i:1", "i:2"], ["1", "2"], "[]") == (
+        b'{"1":["a", "b"],"2":[]}'
+    )
+
+
+@pytest.mark.skip_integration_test_if_not_enabled()
+def test_store_get_many_json_treats_empty_value_as_missing(redis_store):
+    redis_store.set("i:1", "")
+    redis_store.set("i:2", '["a"]')
+    assert list(iter_interests(redis_store, [1, 2, 3])) == [
+        {"1": [], "2": ["a"], "3": []}
+    ]
+
+
+@pytest.mark.skip_integration_test_if_not_enabled()
+def test_store_cache_get_or_set_refreshes_early(redis_store):
+    assert redis_store.cache_get_or_set("key", "first", 3600) is None
+    assert redis_store.cache_get_or_set("key", "second", 3600, 60) == b"first"
+    assert redis_store.cache_get_or_set("key", "third", 3600, 7200) is None
+    assert redis_store.cache_get("key") == b"third"
+
+
+@pytest.mark.skip_integration_test_if_not_enabled()
+def test_store_set_delete_scan(redis_store):
+    redis_store.set("i:1:d:20170719", '["a"]')
+    redis_store.set("i:2:d:20170719", '["b"]')
+    assert sorted(redis_store.scan("i:*:d:*")) == ["i:1:d:20170719", "i:2:d:20170719"]
+    redis_store.delete(["i:1:d:20170719", "i:3:d:20170719"])
+    assert redis_store.get_many(["i:1:d:20170719", "i:2:d:20170719"]) == [
+        None,
+        b'["b"]',
+    ]
+
+
+@pytest.mark.skip_integration_test_if_not_enabled()
+def test_store_cache_get_or_set_many(redis_store):
+    redis_store.cache_set("uid:2", "2.0", 3600)
+    assert redis_store.cache_get_or_set_many(
+        ["uid:1", "uid:2"], [1.5, 3.0], [3600, 3600]
+    ) == [None, b"2.0"]
+    assert redis_store.cache_get("uid:1") == b"1.5"
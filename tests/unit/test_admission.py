@@ -0,0 +1,85 @@
+import threading
+import time
+from unittest.mock import Mock
+
+from homework_05.admission import (
+    AdmissionController,
+    RateLimiter,
+    RedisRateLimiter,
+    TokenBucket,
+)
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    retry_after = bucket.take()
+    assert 0 < retry_after <= 0.1
+    time.sleep(retry_after)
+    assert bucket.take() == 0
+
+
+def test_rate_limiter_keeps_bucket_per_key():
+    limiter = RateLimiter(rate=1, burst=1, max_keys=2)
+    assert limiter.acquire("a:1") == 0
+    assert limiter.acquire("a:1") > 0
+    assert limiter.acquire("b:2") == 0
+    assert limiter.acquire("c:3") == 0
+    # Bucket of "a:1" is evicted as least recently used
+    assert limiter.acquire("a:1") == 0
+
+
+def test_redis_rate_limiter():
+    pipe = Mock()
+    pipe.execute = Mock(side_effect=[[1, True], [2, True], [3, True]])
+    client = Mock()
+    client.pipeline = Mock(return_value=pipe)
+    limiter = RedisRateLimiter(client, rate=2)
+
+    assert limiter.acquire("a:1") == 0
+    assert limiter.acquire("a:1") == 0
+    assert 0 < limiter.acquire("a:1") <= 1
+
+
+def test_redis_rate_limiter_fails_open():
+    client = Mock()
+    client.pipeline = Mock(side_effect=ConnectionError("Test will pass!"))
+    assert RedisRateLimiter(client, rate=1).acquire("a:1") == 0
+
+
+def test_admission_controller_caps_inflight_requests():
+    admission = AdmissionController(max_inflight=1, target=0.01, max_wait=0.05)
+    assert admission.acquire()
+    assert not admission.acquire()
+    admission.release()
+    assert admission.acquire()
+    admission.release()
+    assert admission.shed == 1
+
+
+def test_admission_controller_sheds_on_standing_queue():
+    admission = AdmissionController(
+        max_inflight=1, target=0.01, interval=0.02, max_wait=1
+    )
+    assert admission.acquire()
+    threading.Timer(0.05, admission.release).start()
+    # Waits longer than target, but gets the slot
+    assert admission.acquire()
+    threading.Timer(0.05, admission.release).start()
+    # Queue delay stays above target for the whole interval
+    assert not admission.acquire()
+    assert admission.dropping
+
+    # Slot is taken without queueing, so shedding stops
+    assert admission.acquire()
+    assert not admission.dropping
+
+
+def test_admission_controller_rejects_fast_while_dropping():
+    admission = AdmissionController(max_inflight=1, target=0.01, max_wait=1)
+    assert admission.acquire()
+    admission.dropping = True
+    started = time.monotonic()
+    assert not admission.acquire()
+    assert time.monotonic() - started < 0.5
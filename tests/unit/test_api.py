@@ -1,12 +1,16 @@
 import hashlib
 import datetime
+import fnmatch
 import functools
 import json
 import random
 import unittest
-from typing import Any
+import unittest.mock
+from typing import Any, Iterator
 
-from homework_05 import api
+from homework_05 import api, scoring
+from homework_05.admission import RateLimiter
+from homework_05.scoring import set_interests
 from homework_05.store import Store
 
 
@@ -14,15 +18,31 @@ class InMemoryStore(Store):
     def __init__(self):
         self.__storage = {}
 
+    def keys(self) -> list[str]:
+        return list(self.__storage)
+
     def get(self, key: str) -> Any:
         return self.__storage[key]
 
+    def get_many(self, keys: list[str]) -> list[Any]:
+        return [self.__storage.get(key) for key in keys]
+
     def cache_get(self, key: str) -> Any:
         return self.__storage.get(key)
 
     def cache_set(self, key: str, value: Any, ttl: int = 60):
         self.__storage[key] = json.dumps(value).encode("utf-8")
 
+    def set(self, key: str, value: Any):
+        self.__storage[key] = value.encode("utf-8") if isinstance(value, str) else value
+
+    def delete(self, keys: list[str]):
+        for key in keys:
+            self.__storage.pop(key, None)
+
+    def scan(self, pattern: str) -> Iterator[str]:
+        return iter(fnmatch.filter(list(self.__storage), pattern))
+
 
 def cases(cases):
     def decorator(f):
@@ -85,6 +105,36 @@ class TestSuite(unittest.TestCase):
             ).encode("utf-8")
             request["token"] = hashlib.sha512(msg).hexdigest()
 
+    def get_limited_response(self, request, rate_limiters, peer="10.0.0.1"):
+        return api.method_handler(
+            {
+                "body": request,
+                "headers": self.headers,
+                "rate_limiters": rate_limiters,
+                "peer": peer,
+            },
+            self.context,
+            self.store,
+        )
+
+    def test_rate_limit_is_applied_after_auth(self):
+        rate_limiters = [RateLimiter(rate=1, burst=2)]
+        request = {
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "online_score",
+            "arguments": {"phone": "79175002040", "email": "stupnikov@otus.ru"},
+        }
+        forged = dict(request, token="bogus")
+        for _ in range(5):
+            _, code = self.get_limited_response(forged, rate_limiters, "10.0.0.2")
+        self.assertEqual(api.TOO_MANY_REQUESTS, code, "Failed auth is limited by peer")
+        self.assertGreater(self.context.pop("retry_after"), 0)
+
+        self.set_valid_auth(request)
+        codes = [self.get_limited_response(request, rate_limiters)[1] for _ in range(3)]
+        self.assertEqual([api.OK, api.OK, api.TOO_MANY_REQUESTS], codes)
+
     def test_empty_request(self):
         _, code = self.get_response({})
         self.assertEqual(api.INVALID_REQUEST, code)
@@ -168,6 +218,9 @@ class TestSuite(unittest.TestCase):
             },
             {"phone": "79175002040", "birthday": "01.01.2000", "first_name": "s"},
             {"email": "stupnikov@otus.ru", "gender": 1, "last_name": 2},
+            {"email": "stupnikov@otus.ru"},
+            {"phone": None, "email": "stupnikov@otus.ru"},
+            {"phone": "", "email": "stupnikov@otus.ru"},
         ]
     )
     def test_invalid_score_request(self, arguments):
@@ -219,6 +272,25 @@ class TestSuite(unittest.TestCase):
         self.assertTrue(isinstance(score, (int, float)) and score >= 0, arguments)
         self.assertEqual(sorted(self.context["has"]), sorted(arguments.keys()))
 
+    @cases(
+        [
+            ({"email": "stupnikov@otus.ru", "first_name": "a", "last_name": "b"}, 2.0),
+            ({"phone": None, "first_name": "c", "last_name": "d"}, 0.5),
+            ({"phone": "79175002040", "email": "stupnikov@otus.ru"}, 3.0),
+        ]
+    )
+    def test_missing_phone_is_not_scored(self, arguments, score):
+        request = {
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "online_score",
+            "arguments": arguments,
+        }
+        self.set_valid_auth(request)
+        response, code = self.get_response(request)
+        self.assertEqual(api.OK, code, arguments)
+        self.assertEqual({"score": score}, response)
+
     def test_ok_score_admin_request(self):
         arguments = {"phone": "79175002040", "email": "stupnikov@otus.ru"}
         request = {
@@ -287,6 +359,123 @@ class TestSuite(unittest.TestCase):
         )
         self.assertEqual(self.context.get("nclients"), len(arguments["client_ids"]))
 
+    def test_degraded_interests_request(self):
+        request = {
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "clients_interests",
+            "arguments": {"client_ids": [1, 2]},
+        }
+        self.set_valid_auth(request)
+        self.context["degraded"] = True
+        _, code = self.get_response(request)
+        self.assertEqual(api.SERVICE_UNAVAILABLE, code)
+
+    def test_interests_request_reads_only_requested_date(self):
+        day = datetime.date(2017, 7, 19)
+        set_interests(self.store, 1, ["cars"], day)
+        set_interests(self.store, 1, ["pets"], day + datetime.timedelta(days=1))
+        self.store.cache_set("i:1", ["books"])
+        request = {
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "clients_interests",
+            "arguments": {"client_ids": [1], "date": "19.07.2017"},
+        }
+        self.set_valid_auth(request)
+        response, code = self.get_response(request)
+        self.assertEqual(api.OK, code)
+        self.assertEqual({"1": ["cars"]}, response)
+
+    def test_interests_request_falls_back_to_undated_interests(self):
+        set_interests(self.store, 1, ["cars"], datetime.date(2017, 7, 20))
+        self.store.cache_set("i:1", ["books"])
+        self.store.cache_set("i:2", ["pets"])
+        request = {
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "clients_interests",
+            "arguments": {"client_ids": [1, 2, 3], "date": "19.07.2017"},
+        }
+        self.set_valid_auth(request)
+        response, code = self.get_response(request)
+        self.assertEqual(api.OK, code)
+        # Client 1 is partitioned and has no interests that day
+        self.assertEqual({"1": [], "2": ["pets"], "3": []}, response)
+
+        with unittest.mock.patch.object(scoring, "UNDATED_INTERESTS_FALLBACK", False):
+            response, code = self.get_response(request)
+        self.assertEqual(api.OK, code)
+        self.assertEqual({"1": [], "2": [], "3": []}, response)
+
+    def test_degraded_score_request(self):
+        request = {
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "online_score",
+            "arguments": {"first_name": "a", "last_name": "b"},
+        }
+        self.set_valid_auth(request)
+        self.context["degraded"] = True
+        response, code = self.get_response(request)
+        self.assertEqual(api.OK, code)
+        self.assertEqual({"score": 0.5}, response)
+        self.assertEqual(len(self.store.keys()), 0)
+
+    def test_ok_interests_stream_request(self):
+        client_ids = list(range(250))
+        request = {
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "clients_interests",
+            "arguments": {"client_ids": client_ids},
+        }
+        self.preheat_kv_store(client_ids)
+        self.set_valid_auth(request)
+        self.context["stream"] = True
+        response, code = self.get_response(request)
+        self.assertEqual(api.OK, code)
+        chunks = list(response)
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(
+            [str(cid) for cid in client_ids], [k for c in chunks for k in c.keys()]
+        )
+
+    @cases(
+        [
+            {"account": "horns&hoofs", "login": "h&f", "method": "profile"},
+            {"account": "horns&hoofs", "login": "h&f", "method": "trace"},
+            {"account": "horns&hoofs", "login": "h&f", "method": "hotkeys"},
+        ]
+    )
+    def test_admin_methods_forbidden_for_users(self, request):
+        request["arguments"] = {}
+        self.set_valid_auth(request)
+        _, code = self.get_response(request)
+        self.assertEqual(api.FORBIDDEN, code)
+
+    @cases([{}, {"seconds": 0}, {"seconds": "1"}, {"seconds": 3600}])
+    def test_invalid_profile_request(self, arguments):
+        request = {"login": "admin", "method": "profile", "arguments": arguments}
+        self.set_valid_auth(request)
+        response, code = self.get_response(request)
+        self.assertEqual(api.INVALID_REQUEST, code, arguments)
+        self.assertTrue(len(response))
+
+    def test_ok_trace_request(self):
+        request = {"login": "admin", "method": "trace", "arguments": {}}
+        self.set_valid_auth(request)
+        response, code = self.get_response(request)
+        self.assertEqual(api.OK, code)
+        self.assertIn("traceEvents", response)
+
+    def test_ok_hotkeys_request(self):
+        request = {"login": "admin", "method": "hotkeys", "arguments": {"limit": 10}}
+        self.set_valid_auth(request)
+        response, code = self.get_response(request)
+        self.assertEqual(api.OK, code)
+        self.assertIn("keys", response)
+
 
 if __name__ == "__main__":
     unittest.main()
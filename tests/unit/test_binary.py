@@ -0,0 +1,189 @@
+import datetime
+import hashlib
+import socket
+import threading
+
+import pytest
+
+from homework_05 import api
+from homework_05.admission import AdmissionController, RateLimiter
+from homework_05.binary import (
+    MAX_DEPTH,
+    BinaryClient,
+    BinaryServer,
+    ProtocolError,
+    frame,
+    packb,
+    read_frame,
+    unpackb,
+)
+from tests.unit.test_api import InMemoryStore
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (None, b"\xc0"),
+        (True, b"\xc3"),
+        (1, b"\x01"),
+        (-1, b"\xff"),
+        (2**40, b"\xcf\x00\x00\x01\x00\x00\x00\x00\x00"),
+        (-(2**40), b"\xd3\xff\xff\xff\x00\x00\x00\x00\x00"),
+        (1.5, b"\xcb\x3f\xf8\x00\x00\x00\x00\x00\x00"),
+        ("abc", b"\xa3abc"),
+        (b"\x00", b"\xc4\x01\x00"),
+        ([1, "a"], b"\x92\x01\xa1a"),
+        ({"a": [None]}, b"\x81\xa1a\x91\xc0"),
+    ],
+)
+def test_packb_is_msgpack_compatible(value, expected):
+    assert packb(value) == expected
+    assert unpackb(expected) == value
+
+
+def test_packb_roundtrip_of_large_values():
+    value = {
+        "client_ids": list(range(70_000)),
+        "text": "х" * 70_000,
+        "nested": {str(i): [i, -i, i / 3] for i in range(300)},
+    }
+    assert unpackb(packb(value)) == value
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"\xa3ab",
+        b"\xc1",
+        b"\x01\x02",
+        b"\x92\x01",
+        b"\x81\x90\xc0",
+        b"\x91" * 100_000,
+    ],
+    ids=["truncated", "unsupported", "extra", "short-array", "array-key", "deep"],
+)
+def test_unpackb_rejects_malformed_payload(data):
+    with pytest.raises(ProtocolError):
+        unpackb(data)
+
+
+def test_unpackb_limits_nesting_depth():
+    value: list = []
+    for _ in range(MAX_DEPTH - 1):
+        value = [value]
+    assert unpackb(packb(value)) == value
+    with pytest.raises(ProtocolError):
+        unpackb(packb([value]))
+
+
+@pytest.fixture
+def binary_server():
+    store = InMemoryStore()
+    for cid in range(100):
+        store.cache_set(f"i:{cid}", [f"interest-{cid}"])
+    api.MainHTTPHandler.store = store
+    server = BinaryServer(("localhost", 0), workers=8)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    api.MainHTTPHandler.store = None
+
+
+@pytest.fixture
+def binary_client(binary_server):
+    client = BinaryClient("localhost", binary_server.server_address[1])
+    yield client
+    client.close()
+
+
+def interests_request(cid: int) -> dict:
+    request: dict = {
+        "account": "horns&hoofs",
+        "login": "h&f",
+        "method": "clients_interests",
+        "arguments": {"client_ids": [cid]},
+    }
+    msg = (request["account"] + request["login"] + api.SALT).encode("utf-8")
+    request["token"] = hashlib.sha512(msg).hexdigest()
+    return request
+
+
+def test_binary_protocol_routes_to_method_handler(binary_client):
+    assert binary_client.call(interests_request(1)) == {
+        "response": {"1": ["interest-1"]},
+        "code": 200,
+    }
+    assert binary_client.call({"login": "h&f"}, path="unknown")["code"] == 404
+    assert binary_client.call({"login": "h&f", "token": "x"})["code"] == 422
+
+
+def test_binary_protocol_multiplexes_requests(binary_client):
+    futures = {cid: binary_client.submit(interests_request(cid)) for cid in range(100)}
+    for cid, future in futures.items():
+        assert future.result(5) == {
+            "response": {str(cid): [f"interest-{cid}"]},
+            "code": 200,
+        }
+
+
+def test_binary_protocol_admin_request(binary_client):
+    request: dict = {"login": "admin", "method": "online_score"}
+    request["token"] = hashlib.sha512(
+        (datetime.datetime.now().strftime("%Y%m%d%H") + api.ADMIN_SALT).encode("utf-8")
+    ).hexdigest()
+    request["arguments"] = {"first_name": "a", "last_name": "b"}
+    assert binary_client.call(request) == {"response": {"score": 42}, "code": 200}
+
+
+@pytest.mark.parametrize(
+    "payload, code",
+    [
+        (b"\x81\x90\xc0", 400),
+        (b"\x91" * 100_000, 400),
+        (packb({"path": ["method"]}), 404),
+        (packb({"path": "method", "body": ["a"]}), 500),
+    ],
+    ids=["unhashable-key", "deep-nesting", "unhashable-path", "array-body"],
+)
+def test_binary_protocol_answers_malformed_requests(binary_server, payload, code):
+    with socket.create_connection(binary_server.server_address, timeout=5) as sock:
+        sock.sendall(frame(7, payload))
+        received = read_frame(sock)
+    assert received is not None
+    request_id, response = received
+    assert request_id == 7
+    assert unpackb(response)["code"] == code
+
+
+def test_binary_protocol_caps_inflight_requests(binary_server):
+    binary_server.max_inflight = 2
+    client = BinaryClient("localhost", binary_server.server_address[1])
+    try:
+        futures = [client.submit(interests_request(cid)) for cid in range(20)]
+        assert [future.result(5)["code"] for future in futures] == [200] * 20
+    finally:
+        client.close()
+
+
+def test_binary_protocol_applies_admission_and_rate_limits(binary_client):
+    api.MainHTTPHandler.admission = AdmissionController(max_inflight=1, max_wait=0)
+    api.MainHTTPHandler.admission.acquire()
+    try:
+        assert binary_client.call(interests_request(1)) == {
+            "error": "Service Unavailable",
+            "code": 503,
+            "retry_after": api.RETRY_AFTER,
+        }
+    finally:
+        api.MainHTTPHandler.admission = None
+
+    api.MainHTTPHandler.rate_limiters = [RateLimiter(rate=0.001, burst=1)]
+    try:
+        assert binary_client.call(interests_request(1))["code"] == 200
+        response = binary_client.call(interests_request(1))
+        assert response["code"] == 429
+        assert response["retry_after"] > 0
+    finally:
+        api.MainHTTPHandler.rate_limiters = []
@@ -0,0 +1,83 @@
+import gzip
+import zlib
+
+import pytest
+
+from homework_05 import compression
+from homework_05.compression import (
+    CompressionStats,
+    UnsupportedEncoding,
+    compressor,
+    decompress,
+    negotiate,
+)
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        (None, None),
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("deflate, gzip", "gzip"),
+        ("gzip;q=0.5, deflate", "deflate"),
+        ("gzip;q=0", None),
+        ("unknown", None),
+        ("GZIP", "gzip"),
+        ("*", next(iter(compression.CODECS))),
+    ],
+)
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding) == expected
+
+
+@pytest.mark.parametrize("coding", list(compression.CODECS))
+def test_streamed_compression_roundtrip(coding):
+    chunks = [f'{{"{i}": ["cars", "pets"]}}\n'.encode() * 50 for i in range(10)]
+    stream_compressor = compressor(coding, 6)
+    stats = CompressionStats(coding)
+    data = b"".join(stats.run(stream_compressor.compress, chunk) for chunk in chunks)
+    data += stats.run(lambda _: stream_compressor.finish(), b"")
+
+    assert decompress(coding, data) == b"".join(chunks)
+    result = stats.as_dict()
+    assert result["raw_size"] == sum(len(chunk) for chunk in chunks)
+    assert result["compressed_size"] == len(data)
+    assert result["ratio"] > 1
+    assert result["cpu_ms"] >= 0
+
+
+def test_streamed_compression_chunks_are_decodable_immediately():
+    stream_compressor = compressor("gzip", 6)
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for i in range(3):
+        chunk = f"line {i}\n".encode()
+        assert decompressor.decompress(stream_compressor.compress(chunk)) == chunk
+
+
+def test_decompress_request_body():
+    assert decompress("gzip", gzip.compress(b'{"a": 1}')) == b'{"a": 1}'
+    assert decompress("identity", b'{"a": 1}') == b'{"a": 1}'
+    with pytest.raises(UnsupportedEncoding):
+        decompress("compress", b"")
+
+
+@pytest.mark.parametrize("coding", list(compression.CODECS))
+def test_decompress_limits_body_size(monkeypatch, coding):
+    monkeypatch.setattr(compression, "MAX_DECOMPRESSED_SIZE", 1024)
+    for size in (1024, 2048):
+        body_compressor = compressor(coding, 6)
+        data = body_compressor.compress(b"0" * size) + body_compressor.finish()
+        if size > compression.MAX_DECOMPRESSED_SIZE:
+            with pytest.raises(ValueError):
+                decompress(coding, data)
+        else:
+            assert decompress(coding, data) == b"0" * size
+
+
+def test_decompress_limits_zstd_frame_with_content_size(monkeypatch):
+    zstandard = pytest.importorskip("zstandard")
+    monkeypatch.setattr(compression, "MAX_DECOMPRESSED_SIZE", 1024)
+    with pytest.raises(ValueError):
+        decompress("zstd", zstandard.ZstdCompressor().compress(b"0" * 2048))
@@ -0,0 +1,69 @@
+import time
+from unittest.mock import Mock
+
+from homework_05.health import HealthMonitor
+from homework_05.store import Store
+
+
+def test_health_monitor_is_not_healthy_before_first_check():
+    monitor = HealthMonitor(Mock(spec=Store))
+    assert not monitor.healthy
+    assert not monitor.degraded
+    assert monitor.state()["checks"] == 0
+
+
+def test_health_monitor_tracks_rtt_and_errors():
+    store_mock = Mock(spec=Store)
+    store_mock.ping = Mock(
+        side_effect=[
+            None,
+            ConnectionError("Test will pass!"),
+            ConnectionError(),
+            None,
+            None,
+        ]
+    )
+    monitor = HealthMonitor(store_mock, window=4, max_error_rate=0.5)
+
+    monitor.check()
+    assert monitor.healthy
+    assert monitor.rtt is not None
+
+    monitor.check()
+    assert monitor.healthy
+    assert monitor.state()["last_error"] == "Test will pass!"
+    assert monitor.error_rate == 0.5
+
+    monitor.check()
+    assert not monitor.healthy
+    assert monitor.degraded
+
+    monitor.check()
+    assert monitor.healthy
+    assert monitor.state()["last_error"] is None
+
+    monitor.check()
+    assert monitor.error_rate == 0.5
+
+
+def test_health_monitor_degrades_on_single_error_without_error_budget():
+    store_mock = Mock(spec=Store)
+    store_mock.ping = Mock(side_effect=[None, ConnectionError()])
+    monitor = HealthMonitor(store_mock, max_error_rate=0.0)
+
+    monitor.check()
+    assert monitor.healthy
+
+    monitor.check()
+    assert not monitor.healthy
+    assert monitor.degraded
+
+
+def test_health_monitor_checks_in_background():
+    store_mock = Mock(spec=Store)
+    monitor = HealthMonitor(store_mock, interval=0.01)
+    monitor.start()
+    time.sleep(0.05)
+    monitor.stop()
+    assert store_mock.ping.call_count > 1
+    assert monitor.healthy
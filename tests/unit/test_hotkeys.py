@@ -0,0 +1,59 @@
+import random
+from unittest.mock import Mock
+
+from homework_05.hotkeys import CountMinSketch, HotKeyStore, HotKeyTracker
+from homework_05.local_cache import LocalCache
+from homework_05.store import Store
+
+
+def test_count_min_sketch_never_underestimates():
+    sketch = CountMinSketch(width=1024, depth=4)
+    counts = {f"uid:{i}": i for i in range(200)}
+    for key, count in counts.items():
+        for _ in range(count):
+            sketch.add(key)
+    assert all(sketch.estimate(key) >= count for key, count in counts.items())
+    assert sketch.estimate("uid:199") < 199 * 2
+
+    sketch.decay()
+    assert sketch.estimate("uid:199") >= 199 // 2
+
+
+def test_hot_key_tracker_finds_heavy_hitters():
+    tracker = HotKeyTracker(k=5)
+    rnd = random.Random(42)
+    stream = [f"i:{i}" for i in range(5) for _ in range(200)]
+    stream += [f"i:{rnd.randrange(5, 10_000)}" for _ in range(5000)]
+    rnd.shuffle(stream)
+    for key in stream:
+        tracker.record(key)
+
+    assert {key for key, _ in tracker.top()} == {f"i:{i}" for i in range(5)}
+    assert len(tracker.top(2)) == 2
+    exported = tracker.export(1)
+    assert exported["accesses"] == len(stream)
+    assert exported["keys"][0]["count"] >= 200
+
+
+def test_hot_key_tracker_decays_counts():
+    tracker = HotKeyTracker(k=2, decay_every=100)
+    for _ in range(100):
+        tracker.record(b"uid:1")
+    assert tracker.top() == [(b"uid:1", 50)]
+    assert tracker.export()["keys"] == [{"key": "uid:1", "count": 50}]
+
+
+def test_hot_key_store_records_accesses_and_pins_top_keys():
+    store_mock = Mock(spec=Store)
+    tracker = HotKeyTracker(k=2)
+    cache = LocalCache(max_size=10)
+    store = HotKeyStore(store_mock, tracker, cache, pin_interval=0)
+
+    store.get_many(["i:1", "i:2"])
+    store.cache_get_or_set("uid:1", 1.5, 60)
+    store.cache_get("uid:1")
+    store_mock.get_many.assert_called_once_with(["i:1", "i:2"])
+    store_mock.cache_get_or_set.assert_called_once_with("uid:1", 1.5, 60, 0.0)
+
+    assert tracker.top(1) == [("uid:1", 2)]
+    assert cache.stats()["pinned"] == 2
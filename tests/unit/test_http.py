@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import http.client
+import json
+import threading
+import zlib
+from http.server import ThreadingHTTPServer
+from unittest.mock import Mock
+
+import pytest
+
+from homework_05 import api, compression
+from homework_05.health import HealthMonitor
+from tests.unit.test_api import InMemoryStore
+
+
+class QuietHTTPHandler(api.MainHTTPHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def connection():
+    store = InMemoryStore()
+    for cid in range(100):
+        store.cache_set(f"i:{cid}", [f"interest-{cid}", "cars", "pets"])
+    QuietHTTPHandler.store = store
+    server = ThreadingHTTPServer(("localhost", 0), QuietHTTPHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    connection = http.client.HTTPConnection(
+        "localhost", server.server_address[1], timeout=5
+    )
+    yield connection
+    connection.close()
+    server.shutdown()
+    server.server_close()
+    QuietHTTPHandler.store = None
+
+
+def interests_request(client_ids: list[int]) -> bytes:
+    request: dict = {
+        "account": "horns&hoofs",
+        "login": "h&f",
+        "method": "clients_interests",
+        "arguments": {"client_ids": client_ids},
+    }
+    msg = (request["account"] + request["login"] + api.SALT).encode("utf-8")
+    request["token"] = hashlib.sha512(msg).hexdigest()
+    return json.dumps(request).encode("utf-8")
+
+
+def post(connection, body: bytes, headers: dict) -> http.client.HTTPResponse:
+    connection.request("POST", "/method/", body, headers)
+    return connection.getresponse()
+
+
+def test_response_is_compressed_by_accept_encoding(connection):
+    response = post(
+        connection, interests_request(list(range(100))), {"Accept-Encoding": "gzip"}
+    )
+    assert response.status == 200
+    assert response.getheader("Content-Encoding") == "gzip"
+    assert response.getheader("Vary") == "Accept-Encoding"
+    result = json.loads(gzip.decompress(response.read()))
+    assert result["response"]["42"] == ["interest-42", "cars", "pets"]
+
+    # Small response isn't compressed, but still varies by Accept-Encoding
+    response = post(connection, interests_request([1]), {"Accept-Encoding": "gzip"})
+    assert response.getheader("Content-Encoding") is None
+    assert response.getheader("Vary") == "Accept-Encoding"
+    assert json.loads(response.read())["response"] == {
+        "1": ["interest-1", "cars", "pets"]
+    }
+
+
+def test_streamed_response_is_compressed(connection):
+    response = post(
+        connection,
+        interests_request(list(range(100))),
+        {"Accept": api.NDJSON, "Accept-Encoding": "deflate"},
+    )
+    assert response.status == 200
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    assert response.getheader("Content-Encoding") == "deflate"
+    assert response.getheader("Vary") == "Accept-Encoding"
+    lines = zlib.decompress(response.read()).decode("utf-8").splitlines()
+    assert len(lines) == 100
+    assert json.loads(lines[7]) == {"7": ["interest-7", "cars", "pets"]}
+
+
+def test_compressed_request_body_is_accepted(connection):
+    response = post(
+        connection, gzip.compress(interests_request([1])), {"Content-Encoding": "gzip"}
+    )
+    assert response.status == 200
+    assert json.loads(response.read())["response"] == {
+        "1": ["interest-1", "cars", "pets"]
+    }
+
+
+@pytest.mark.parametrize("content_encoding", ["compress", "gzip"])
+def test_undecodable_request_body_is_rejected(
+    connection, monkeypatch, content_encoding
+):
+    # gzip body is over the decompressed size limit
+    monkeypatch.setattr(compression, "MAX_DECOMPRESSED_SIZE", 16)
+    response = post(
+        connection,
+        gzip.compress(interests_request([1])),
+        {"Content-Encoding": content_encoding},
+    )
+    assert response.status == 400
+    assert json.loads(response.read())["code"] == 400
+
+
+def test_store_is_not_degraded_before_first_health_check(connection):
+    store = Mock(wraps=QuietHTTPHandler.store)
+    store.ping = Mock(side_effect=ConnectionError("Redis is down"))
+    QuietHTTPHandler.health = HealthMonitor(store)
+    try:
+        # Not checked yet: requests are served, the readiness probe is failing
+        response = post(connection, interests_request([1]), {})
+        assert response.status == 200
+        response.read()
+        connection.request("GET", "/readyz")
+        readiness = connection.getresponse()
+        readiness.read()
+        assert readiness.status == 503
+
+        QuietHTTPHandler.health.check()
+        response = post(connection, interests_request([1]), {})
+        assert response.status == 503
+        response.read()
+    finally:
+        QuietHTTPHandler.health = None
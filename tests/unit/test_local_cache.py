@@ -0,0 +1,168 @@
+import time
+
+import os
+import struct
+
+from homework_05.local_cache import (
+    MISSING,
+    SNAPSHOT_ENTRY,
+    SNAPSHOT_HEADER,
+    SNAPSHOT_MAGIC,
+    LocalCache,
+    SnapshotWriter,
+    read_snapshot,
+    restore_snapshot,
+    write_snapshot,
+)
+from homework_05.store import TrackingInvalidator
+
+
+def test_local_cache_get_set():
+    cache = LocalCache()
+    assert cache.get(b"key") is MISSING
+    cache.set(b"key", b"value")
+    cache.set(b"none", None)
+    assert cache.get(b"key") == b"value"
+    assert cache.get(b"none") is None
+    assert cache.stats() == {
+        "size": 2,
+        "hits": 2,
+        "misses": 1,
+        "epoch": 0,
+        "pinned": 0,
+    }
+
+
+def test_local_cache_expires_entries():
+    cache = LocalCache(ttl=0.01)
+    cache.set(b"key", b"value")
+    time.sleep(0.02)
+    assert cache.get(b"key") is MISSING
+    assert len(cache) == 0
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache(max_size=2)
+    cache.set(b"a", 1)
+    cache.set(b"b", 2)
+    cache.get(b"a")
+    cache.set(b"c", 3)
+    assert cache.get(b"b") is MISSING
+    assert cache.get(b"a") == 1 and cache.get(b"c") == 3
+
+
+def test_local_cache_keeps_pinned_keys():
+    cache = LocalCache(max_size=4)
+    cache.pin({b"a", b"b"})
+    for key in (b"a", b"b", b"c", b"d", b"e", b"f"):
+        cache.set(key, key)
+    assert cache.get(b"a") == b"a" and cache.get(b"b") == b"b"
+    assert cache.get(b"c") is MISSING and cache.get(b"d") is MISSING
+    assert cache.get(b"f") == b"f"
+
+    cache.invalidate([b"a"])
+    assert cache.get(b"a") is MISSING
+
+
+def test_local_cache_rejects_values_read_before_invalidation():
+    cache = LocalCache()
+    epoch = cache.epoch
+    cache.invalidate([b"key"])
+    cache.set(b"key", b"stale", epoch=epoch)
+    assert cache.get(b"key") is MISSING
+
+
+def test_local_cache_snapshot_roundtrip(tmp_path):
+    path = str(tmp_path / "cache.snapshot")
+    cache = LocalCache(ttl=60)
+    cache.set(b"uid:1", b"1.5")
+    cache.set(b"i:1", None, ttl=30)
+    cache.set(b"obj", object())
+    assert write_snapshot(cache, path) == 2
+    assert os.listdir(tmp_path) == ["cache.snapshot"]
+
+    restored = LocalCache(max_size=10, ttl=60)
+    restored.set(b"i:1", b"[]")
+    assert restore_snapshot(restored, path) == 1
+    # Restored entries are older than the ones cached since start
+    assert [(key, value) for key, value, _ in restored.entries()] == [
+        (b"uid:1", b"1.5"),
+        (b"i:1", b"[]"),
+    ]
+    assert all(0 < ttl <= 60 for _, _, ttl in restored.entries())
+
+
+def test_local_cache_snapshot_skips_expired_entries(tmp_path):
+    path = tmp_path / "cache.snapshot"
+    entries = [(b"old", b"1", -1.0), (b"new", None, 10.0)]
+    with open(path, "wb") as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, 0.0, len(entries)))
+        for key, value, ttl in entries:
+            size = -1 if value is None else len(value)
+            f.write(SNAPSHOT_ENTRY.pack(time.time() + ttl, len(key), size))
+            f.write(key + (value or b""))
+
+    assert [(key, value) for key, value, _ in read_snapshot(str(path))] == [
+        (b"new", None)
+    ]
+
+
+def test_local_cache_snapshot_is_not_restored_after_invalidation(tmp_path):
+    path = str(tmp_path / "cache.snapshot")
+    cache = LocalCache()
+    cache.set(b"key", b"value")
+    write_snapshot(cache, path)
+
+    restored = LocalCache()
+    epoch = restored.epoch
+    restored.invalidate([b"key"])
+    assert restored.load(read_snapshot(path), epoch) == 0
+    assert restore_snapshot(LocalCache(), str(tmp_path / "missing")) == 0
+    (tmp_path / "broken").write_bytes(struct.pack(">I", 1))
+    assert restore_snapshot(LocalCache(), str(tmp_path / "broken")) == 0
+
+
+def test_local_cache_snapshot_writer_writes_on_stop(tmp_path):
+    path = str(tmp_path / "cache.snapshot")
+    cache = LocalCache()
+    cache.set(b"key", b"value")
+    writer = SnapshotWriter(cache, path, interval=60)
+    writer.start()
+    writer.stop()
+    assert [key for key, _, _ in read_snapshot(path)] == [b"key"]
+
+
+def test_local_cache_snapshot_writer_keeps_snapshot_while_inactive(tmp_path):
+    path = str(tmp_path / "cache.snapshot")
+    cache = LocalCache()
+    cache.set(b"key", b"value")
+    write_snapshot(cache, path)
+    # Process restarted, the snapshot isn't restored until tracking is established
+    active = False
+    writer = SnapshotWriter(LocalCache(), path, interval=0.01, active=lambda: active)
+    writer.start()
+    time.sleep(0.05)
+    writer.stop()
+    assert [key for key, _, _ in read_snapshot(path)] == [b"key"]
+
+    active = True
+    writer.write()
+    assert list(read_snapshot(path)) == []
+
+
+def test_tracking_invalidator_handles_messages():
+    cache = LocalCache()
+    invalidator = TrackingInvalidator({}, cache)
+    cache.set(b"i:1", b"[]")
+    cache.set(b"i:2", b"[]")
+    invalidator.track_write(b"i:1")
+
+    invalidator.handle_message([b"subscribe", b"__redis__:invalidate", 1])
+    assert len(cache) == 2
+
+    invalidator.handle_message([b"message", b"__redis__:invalidate", [b"i:1"]])
+    assert cache.get(b"i:1") is MISSING and cache.get(b"i:2") == b"[]"
+    assert invalidator.lag["count"] == 1 and invalidator.lag["last"] >= 0
+
+    invalidator.handle_message([b"message", b"__redis__:invalidate", None])
+    assert len(cache) == 0
@@ -0,0 +1,120 @@
+import random
+import threading
+import time
+
+import pytest
+import redis
+from redis.exceptions import BusyLoadingError, ConnectionError, TimeoutError
+
+from homework_05.admission import RedisRateLimiter
+from benchmarks.resp_server import (
+    FaultProfile,
+    RespServer,
+    constant,
+    lognormal,
+)
+from homework_05.store import RedisStore
+
+
+@pytest.fixture
+def resp_server():
+    servers = []
+
+    def start(profile: FaultProfile | None = None) -> RespServer:
+        server = RespServer(("localhost", 0), profile, seed=1)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def client(server: RespServer, **kwargs) -> redis.Redis:
+    return redis.Redis("localhost", server.server_address[1], **kwargs)
+
+
+def test_resp_server_serves_redis_store(resp_server):
+    server = resp_server()
+    store = RedisStore("localhost", server.server_address[1])
+
+    store.ping()
+    store.cache_set("uid:1", 1.5, 60)
+    store.set("i:1", '["a"]')
+    assert store.get("uid:1") == b"1.5"
+    assert store.get_many(["uid:1", "uid:2"]) == [b"1.5", None]
+    store.set("i:3", "")
+    assert store.get_many_json(["i:1", "i:2", "i:3"], ["1", "2", "3"], "[]") == (
+        b'{"1":["a"],"2":[],"3":[]}'
+    )
+    assert store.cache_get_or_set("uid:2", 2.0, 60) is None
+    assert store.cache_get_or_set("uid:2", 3.0, 60, early_refresh=3600) is None
+    assert store.cache_get("uid:2") == b"3.0"
+    assert store.cache_get_or_set_many(["uid:2", "uid:3"], [0, 4.0], [60, 60]) == [
+        b"3.0",
+        None,
+    ]
+    assert sorted(store.scan("uid:*")) == ["uid:1", "uid:2", "uid:3"]
+    store.delete(["uid:1", "uid:2"])
+    assert store.get_many(["uid:1", "uid:2", "uid:3"]) == [None, None, b"4.0"]
+
+
+def test_resp_server_reloads_flushed_scripts(resp_server):
+    server = resp_server()
+    store = RedisStore("localhost", server.server_address[1])
+    assert store.cache_get_or_set("uid:1", 1.5, 60) is None
+    client(server).script_flush()
+    assert store.cache_get_or_set("uid:1", 2.0, 60) == b"1.5"
+
+
+def test_resp_server_expires_keys(resp_server):
+    server = resp_server()
+    redis_client = client(server)
+    redis_client.set("key", "value", px=10)
+    assert redis_client.pttl("key") > 0
+    time.sleep(0.02)
+    assert redis_client.get("key") is None
+    assert redis_client.pttl("key") == -2
+
+
+def test_resp_server_serves_rate_limiter(resp_server):
+    limiter = RedisRateLimiter(client(resp_server()), rate=2)
+    assert [limiter.acquire("key") for _ in range(3)][:2] == [0.0, 0.0]
+    assert limiter.acquire("key") > 0
+
+
+def test_resp_server_injects_latency(resp_server):
+    redis_client = client(resp_server(FaultProfile(latency=constant(20))))
+    started = time.monotonic()
+    redis_client.get("key")
+    assert time.monotonic() - started >= 0.02
+
+
+@pytest.mark.parametrize(
+    "profile, error",
+    [
+        (FaultProfile(drop_rate=1.0), ConnectionError),
+        (FaultProfile(busy_rate=1.0), BusyLoadingError),
+        (FaultProfile(timeout_rate=1.0, hang=0.5), TimeoutError),
+    ],
+)
+def test_resp_server_injects_faults(resp_server, profile, error):
+    server = resp_server(profile)
+    redis_client = client(server, socket_timeout=0.1)
+    with pytest.raises(error):
+        redis_client.get("key")
+    assert sum(server.faults.values()) == 1
+
+
+def test_fault_profile_picks_faults_by_rate():
+    profile = FaultProfile(
+        latency=lognormal(1.0, 0.5), drop_rate=0.1, busy_rate=0.2, timeout_rate=0.3
+    )
+    rnd = random.Random(1)
+    faults = [profile.fault(rnd) for _ in range(10_000)]
+    assert 0.08 < faults.count("drop") / len(faults) < 0.12
+    assert 0.18 < faults.count("busy") / len(faults) < 0.22
+    assert 0.28 < faults.count("timeout") / len(faults) < 0.32
+    assert profile.delay(b"GET", rnd) > 0
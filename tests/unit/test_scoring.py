@@ -1,15 +1,61 @@
 import datetime
 import math
-from typing import Any
+import fnmatch
+import hashlib
+import itertools
+from typing import Any, Iterator
 from unittest.mock import Mock
 
 import pytest
 
-from homework_05.scoring import get_scoring_key, get_score, get_interests
+from homework_05 import scoring
+from homework_05.scoring import (
+    SCORE_REFRESH_DELTA,
+    SCORE_TTL,
+    SCORE_TTL_JITTER,
+    score_early_refresh,
+    score_ttl,
+    get_scoring_key,
+    get_scoring_key_v1,
+    get_scoring_key_v2,
+    get_score,
+    get_scores,
+    get_scoring_keys,
+    score_many,
+    get_interests,
+    get_interests_range,
+    iter_interests,
+    compact_interests,
+    set_interests,
+)
 from homework_05.store import Store
 from redis.exceptions import ConnectionError
 
 
+class DictStore(Store):
+    def __init__(self):
+        self.storage: dict[str, Any] = {}
+
+    def get(self, key: str) -> Any:
+        return self.storage.get(key)
+
+    def cache_get(self, key: str) -> Any:
+        return self.storage.get(key)
+
+    def cache_set(self, key: str, value: Any, ttl: int = 60):
+        self.storage[key] = value
+
+    def set(self, key: str, value: Any):
+        self.storage[key] = value
+
+    def delete(self, keys: list[str]):
+        for key in keys:
+            self.storage.pop(key, None)
+
+    def scan(self, pattern: str) -> Iterator[str]:
+        return iter(fnmatch.filter(list(self.storage), pattern))
+
+
 @pytest.mark.parametrize(
     "case, score_kwargs, expected",
     [
@@ -35,8 +81,7 @@ from redis.exceptions import ConnectionError
 )
 def test_scoring_get_score(case, score_kwargs, expected):
     store_mock = Mock(spec=Store)
-    store_mock.cache_get = Mock(return_value=None)
-    store_mock.cache_set = Mock(return_value=None)
+    store_mock.cache_get_or_set = Mock(return_value=None)
 
     assert (
         get_score(store=store_mock, **score_kwargs) == expected
@@ -53,30 +98,54 @@ def test_scoring_get_score_can_using_cache():
     key = get_scoring_key(**key_kwargs)  # type: ignore
     expected_cached_value = 1500.0
     store_mock = Mock(spec=Store)
-    store_mock.cache_get = Mock(
+    store_mock.cache_get_or_set = Mock(
         side_effect=[None, str(expected_cached_value).encode("utf-8")]
     )
-    store_mock.cache_set = Mock(return_value=None)
     scoring_kwargs = {"store": store_mock, "email": "stupnikov@otus.ru", "gender": 1}
 
     score = get_score(**(scoring_kwargs | key_kwargs))  # type: ignore
     assert score is not None
 
-    # Check for store cache_get (returns None value) and cache_set was called as expected
-    store_mock.cache_get.assert_called_once_with(key)
-    store_mock.cache_set.assert_called_once_with(key, score, 60 * 60)
-
-    store_mock.cache_get.reset_mock()
-    store_mock.cache_set.reset_mock()
+    # Check for store cache_get_or_set (no cached value, score is stored) was called as expected
+    store_mock.cache_get_or_set.assert_called_once()
+    (called_key, called_score, ttl), kwargs = store_mock.cache_get_or_set.call_args
+    assert (called_key, called_score) == (key, score)
+    assert SCORE_TTL * (1 - SCORE_TTL_JITTER) <= ttl <= SCORE_TTL
+    assert kwargs["early_refresh"] >= 0
 
-    # Check for store cache_get was called and get_score returns cached value.
-    # cache_set should not be called in this case
+    store_mock.cache_get_or_set.reset_mock()
 
+    # Check for get_score returns cached value instead of calculated one
     score = get_score(**(scoring_kwargs | key_kwargs))  # type: ignore
     assert math.isclose(score, expected_cached_value)
 
-    store_mock.cache_get.assert_called_once_with(key)
-    store_mock.cache_set.assert_not_called()
+    store_mock.cache_get_or_set.assert_called_once()
+
+
+def test_scoring_score_ttl_is_jittered():
+    ttls = {score_ttl() for _ in range(1000)}
+    assert len(ttls) > 1
+    assert all(SCORE_TTL * (1 - SCORE_TTL_JITTER) <= ttl <= SCORE_TTL for ttl in ttls)
+
+
+def test_scoring_score_early_refresh_probability():
+    samples = [score_early_refresh() for _ in range(10_000)]
+    assert all(sample >= 0 for sample in samples)
+
+    # Refresh probability at remaining TTL t is exp(-t / delta)
+    def refreshed(remaining_ttl: float) -> float:
+        return sum(sample >= remaining_ttl for sample in samples) / len(samples)
+
+    assert refreshed(0) == 1
+    assert refreshed(SCORE_TTL) < 0.01
+    assert math.isclose(refreshed(SCORE_REFRESH_DELTA), math.exp(-1), abs_tol=0.05)
+
+
+def test_scoring_get_score_can_skip_cache():
+    store_mock = Mock(spec=Store)
+
+    assert get_score(store_mock, first_name="a", last_name="b", use_cache=False) == 0.5
+    store_mock.cache_get_or_set.assert_not_called()
 
 
 @pytest.mark.parametrize(
@@ -95,3 +164,204 @@ def test_scoring_get_interests(case, side_effect: Any, expected):
             _ = get_interests(store_mock, "str")
     else:
         assert get_interests(store_mock, "str") == expected, f"Case '{case}' failed!"
+
+
+def test_scoring_iter_interests_reads_by_chunks():
+    store_mock = Mock(spec=Store)
+    store_mock.get_many = Mock(
+        side_effect=lambda keys: [b'["testing"]' if k != "i:2" else None for k in keys]
+    )
+    store_mock.get_many_json = Mock(
+        side_effect=lambda *args, **kwargs: Store.get_many_json(
+            store_mock, *args, **kwargs
+        )
+    )
+
+    chunks = list(iter_interests(store_mock, [1, 2, 3, 4, 5], chunk_size=2))
+
+    assert chunks == [
+        {"1": ["testing"], "2": []},
+        {"3": ["testing"], "4": ["testing"]},
+        {"5": ["testing"]},
+    ]
+    assert [c.args[0] for c in store_mock.get_many.call_args_list] == [
+        ["i:1", "i:2"],
+        ["i:3", "i:4"],
+        ["i:5"],
+    ]
+
+
+def test_scoring_key_v2_is_compact_and_unambiguous():
+    key = get_scoring_key_v2("a", "b", "79175002040", datetime.date(2000, 1, 1))
+    assert key.startswith("uid:2:") and len(key) == 22
+    assert key.isascii() and "/" not in key and "+" not in key
+    assert key == get_scoring_key("a", "b", "79175002040", datetime.date(2000, 1, 1))
+
+    assert get_scoring_key_v2("ab", "c") != get_scoring_key_v2("a", "bc")
+    assert get_scoring_key_v2(phone=None) == get_scoring_key_v2(phone="")
+    assert get_scoring_key_v2(phone=None) != get_scoring_key_v2(phone="None")
+    assert get_scoring_key_v2(phone=79175002040) == get_scoring_key_v2(  # type: ignore
+        phone="79175002040"
+    )
+
+
+def test_scoring_key_version_can_be_switched(monkeypatch):
+    key_kwargs: dict[str, Any] = {
+        "first_name": "a",
+        "last_name": "b",
+        "phone": "79175002040",
+    }
+    assert (
+        get_scoring_key_v1(**key_kwargs)
+        == "uid:" + hashlib.md5(b"ab79175002040").hexdigest()
+    )
+
+    monkeypatch.setattr(scoring, "SCORING_KEY_VERSION", 1)
+    assert get_scoring_key(**key_kwargs) == get_scoring_key_v1(**key_kwargs)
+    assert get_scoring_keys(["a"], ["b"], ["79175002040"], [None]) == [
+        get_scoring_key_v1(**key_kwargs)
+    ]
+
+
+IDENTITY_COLUMNS = list(
+    zip(
+        *itertools.product(
+            [None, "", "79175002040"],
+            [None, "stupnikov@otus.ru"],
+            [None, datetime.date(2000, 1, 1)],
+            [None, 0, 1],
+            [None, "", "a"],
+            [None, "b"],
+        )
+    )
+)
+
+
+@pytest.mark.parametrize("vectorised", [False, True])
+def test_scoring_score_many_matches_get_score(monkeypatch, vectorised):
+    if vectorised:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(scoring, "numpy", None)
+    phones, emails, birthdays, genders, first_names, last_names = IDENTITY_COLUMNS
+    store_mock = Mock(spec=Store)
+
+    expected = [
+        get_score(store_mock, *row, use_cache=False)  # type: ignore
+        for row in zip(*IDENTITY_COLUMNS)
+    ]
+    assert score_many(*IDENTITY_COLUMNS) == expected
+    assert get_scoring_keys(first_names, last_names, phones, birthdays) == [
+        get_scoring_key(first_name, last_name, phone, birthday)  # type: ignore
+        for first_name, last_name, phone, birthday in zip(
+            first_names, last_names, phones, birthdays
+        )
+    ]
+
+
+def test_scoring_score_many_accepts_numpy_arrays():
+    numpy = pytest.importorskip("numpy")
+    phones, emails, birthdays, genders, first_names, last_names = IDENTITY_COLUMNS
+    expected = score_many(*IDENTITY_COLUMNS)
+
+    # String arrays can't hold None, it's stored as an empty string
+    assert (
+        score_many(
+            numpy.array([phone or "" for phone in phones]),
+            numpy.array([email or "" for email in emails]),
+            numpy.array(birthdays, dtype=object),
+            numpy.array(genders, dtype=object),
+            numpy.array([name or "" for name in first_names]),
+            numpy.array([name or "" for name in last_names]),
+        )
+        == expected
+    )
+
+
+def test_scoring_get_scores_uses_cache_in_one_call():
+    store_mock = Mock(spec=Store)
+    store_mock.cache_get_or_set_many = Mock(return_value=[None, b"3.0"])
+    scores = get_scores(
+        store_mock,
+        phones=["79175002040", None],
+        emails=[None, "stupnikov@otus.ru"],
+        birthdays=[None, None],
+        genders=[None, None],
+        first_names=["a", None],
+        last_names=["b", None],
+    )
+
+    assert scores == [2.0, 3.0]
+    keys, values, ttls, early_refresh = store_mock.cache_get_or_set_many.call_args.args
+    assert keys == [
+        get_scoring_key("a", "b", "79175002040"),
+        get_scoring_key(),
+    ]
+    assert values == [2.0, 1.5]
+    assert len(ttls) == len(early_refresh) == 2
+    assert get_scores(store_mock, [], [], [], [], [], []) == []
+    store_mock.cache_get_or_set_many.assert_called_once()
+
+
+def test_scoring_get_interests_range_reads_daily_and_monthly_partitions():
+    store = DictStore()
+    day = datetime.date(2017, 7, 30)
+    set_interests(store, "1", ["cars", "pets"], day)
+    set_interests(store, "1", ["pets", "tv"], datetime.date(2017, 8, 1))
+    set_interests(store, "1", ["books"], datetime.date(2017, 8, 5))
+    store.set("i:1:m:201707", '{"31": ["geek"], "01": ["otus"]}')
+
+    assert get_interests(store, "1", day) == ["cars", "pets"]
+    assert get_interests(store, "2", day) == []
+    assert get_interests_range(store, ["1", "2"], day, datetime.date(2017, 8, 2)) == {
+        "1": ["cars", "pets", "geek", "tv"],
+        "2": [],
+    }
+
+
+def test_scoring_get_interests_range_reads_undated_only_for_unpartitioned():
+    store = DictStore()
+    set_interests(store, "1", ["cars"], datetime.date(2017, 7, 19))
+    store.set("i:1", '["books"]')
+    store.set("i:2", '["pets"]')
+    store.get_many = Mock(wraps=store.get_many)  # type: ignore
+    day = datetime.date(2017, 7, 19)
+    next_day = datetime.date(2017, 7, 20)
+
+    assert get_interests_range(store, ["1"], day, day) == {"1": ["cars"]}
+    assert store.get_many.call_count == 1
+    # Partitioned client 1 has nothing that day, only client 2 is read undated
+    assert get_interests_range(store, ["1", "2"], next_day, next_day) == {
+        "1": [],
+        "2": ["pets"],
+    }
+    read_keys = [key for call in store.get_many.call_args_list for key in call.args[0]]
+    assert "i:1" not in read_keys
+    assert store.get_many.call_args.args[0] == ["i:2"]
+
+
+def test_scoring_compact_interests_rolls_past_months():
+    store = DictStore()
+    set_interests(store, "1", ["cars"], datetime.date(2017, 7, 19))
+    set_interests(store, "1", ["pets"], datetime.date(2017, 7, 20))
+    set_interests(store, "1", ["tv"], datetime.date(2017, 8, 1))
+    store.set("i:1:m:201707", '{"01": ["otus"]}')
+    before = datetime.date(2017, 8, 2)
+    expected = get_interests_range(store, ["1"], datetime.date(2017, 7, 1), before)
+
+    assert compact_interests(store, before) == 2
+    assert sorted(store.storage) == ["i:1:d:20170801", "i:1:m:201707", "i:1:p"]
+    assert (
+        get_interests_range(store, ["1"], datetime.date(2017, 7, 1), before) == expected
+    )
+    assert compact_interests(store, before) == 0
+
+
+def test_scoring_iter_interests_reads_requested_day():
+    store = DictStore()
+    set_interests(store, "1", ["cars"], datetime.date(2017, 7, 19))
+    store.set("i:1", '["books"]')
+
+    assert list(iter_interests(store, ["1"], day=datetime.date(2017, 7, 19))) == [
+        {"1": ["cars"]}
+    ]
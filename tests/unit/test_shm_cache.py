@@ -0,0 +1,118 @@
+import multiprocessing
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from homework_05.local_cache import MISSING
+from homework_05.shm_cache import SharedCacheStore, SharedMemoryCache
+from homework_05.store import Store
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "shm.cache")
+
+
+def test_shared_memory_cache_get_set(cache_path):
+    cache = SharedMemoryCache(cache_path, slots=64)
+    assert cache.get(b"uid:1") is MISSING
+    assert cache.set(b"uid:1", b"1.5", 60)
+    assert cache.set(b"i:1", None, 60)
+    assert cache.get(b"uid:1") == b"1.5"
+    assert cache.get(b"i:1") is None
+    assert cache.set(b"uid:1", b"3.0", 60)
+    assert cache.get(b"uid:1") == b"3.0"
+    cache.delete(b"uid:1")
+    assert cache.get(b"uid:1") is MISSING
+
+
+def test_shared_memory_cache_expires_entries(cache_path):
+    cache = SharedMemoryCache(cache_path, slots=64)
+    cache.set(b"uid:1", b"1.5", 0.01)
+    time.sleep(0.02)
+    assert cache.get(b"uid:1") is MISSING
+
+
+def test_shared_memory_cache_skips_oversized_entries(cache_path):
+    cache = SharedMemoryCache(cache_path, slots=64, max_key_size=8, max_value_size=8)
+    assert not cache.set(b"long key value", b"1", 60)
+    assert not cache.set(b"key", b"long cached value", 60)
+    assert cache.get(b"key") is MISSING
+
+
+def test_shared_memory_cache_evicts_within_group(cache_path):
+    cache = SharedMemoryCache(cache_path, slots=8)
+    for i in range(20):
+        cache.set(f"k{i}".encode(), str(i).encode(), 60 + i)
+    found = [i for i in range(20) if cache.get(f"k{i}".encode()) is not MISSING]
+    assert found == list(range(12, 20))
+
+
+def fill_cache(path: str, start: int):
+    cache = SharedMemoryCache(path, slots=1024)
+    for i in range(start, start + 100):
+        cache.set(f"i:{i}".encode(), f'["{i}"]'.encode(), 60)
+
+
+def test_shared_memory_cache_is_shared_between_processes(cache_path):
+    cache = SharedMemoryCache(cache_path, slots=1024)
+    processes = [
+        multiprocessing.get_context("fork").Process(
+            target=fill_cache, args=(cache_path, start)
+        )
+        for start in (0, 100)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    assert all(cache.get(f"i:{i}".encode()) == f'["{i}"]'.encode() for i in range(200))
+
+
+def test_shared_cache_store(cache_path):
+    store_mock = Mock(spec=Store)
+    store_mock.cache_get = Mock(return_value=None)
+    store_mock.get_many = Mock(return_value=[b'["a"]', None])
+    store = SharedCacheStore(store_mock, SharedMemoryCache(cache_path, slots=64))
+
+    assert store.cache_get("uid:1") is None
+    assert store.cache_get("uid:1") is None
+    store_mock.cache_get.assert_called_once_with("uid:1")
+
+    store.cache_set("uid:1", 1.5, 3600)
+    store_mock.cache_set.assert_called_once_with("uid:1", 1.5, 3600)
+    assert store.cache_get("uid:1") == b"1.5"
+
+    assert store.get_many(["i:1", "i:2"]) == [b'["a"]', None]
+    assert store.get_many(["i:1", "i:2"]) == [b'["a"]', None]
+    store_mock.get_many.assert_called_once_with(["i:1", "i:2"])
+
+
+def test_shared_cache_store_get_or_set(cache_path):
+    store_mock = Mock(spec=Store)
+    store_mock.cache_get_or_set = Mock(return_value=None)
+    store = SharedCacheStore(store_mock, SharedMemoryCache(cache_path, slots=64))
+
+    assert store.cache_get_or_set("uid:1", 1.5, 3600) is None
+    assert store.cache_get_or_set("uid:1", 3.0, 3600) == b"1.5"
+    store_mock.cache_get_or_set.assert_called_once_with("uid:1", 1.5, 3600, 0.0)
+
+
+def test_shared_cache_store_get_or_set_many(cache_path):
+    store_mock = Mock(spec=Store)
+    store_mock.cache_get_or_set_many = Mock(return_value=[None, b"2.0"])
+    store = SharedCacheStore(store_mock, SharedMemoryCache(cache_path, slots=64))
+
+    assert store.cache_get_or_set_many(["uid:1", "uid:2"], [1.5, 3.0], [60, 60]) == [
+        None,
+        b"2.0",
+    ]
+    assert store.cache_get_or_set_many(["uid:1", "uid:2"], [0, 0], [60, 60]) == [
+        b"1.5",
+        b"2.0",
+    ]
+    store_mock.cache_get_or_set_many.assert_called_once_with(
+        ["uid:1", "uid:2"], [1.5, 3.0], [60, 60], None
+    )
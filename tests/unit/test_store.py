@@ -0,0 +1,104 @@
+import threading
+from unittest.mock import Mock
+
+from benchmarks.resp_server import RespServer
+from homework_05.local_cache import LocalCache
+from homework_05.store import RedisStore, Replica, ReplicaPool, Store
+
+
+def make_pool(count: int = 3) -> ReplicaPool:
+    return ReplicaPool([Replica(f"r{i}", Mock()) for i in range(count)], cooldown=60)
+
+
+def test_replica_pool_round_robin():
+    pool = make_pool()
+    names = []
+    for _ in range(6):
+        replica = pool.acquire()
+        assert replica is not None
+        names.append(replica.name)
+        pool.release(replica)
+    assert names == ["r0", "r1", "r2", "r0", "r1", "r2"]
+
+
+def test_replica_pool_prefers_least_outstanding():
+    pool = make_pool(2)
+    busy = pool.acquire()
+    assert busy is not None and busy.name == "r0"
+    for _ in range(3):
+        replica = pool.acquire()
+        assert replica is not None and replica.name == "r1"
+        pool.release(replica)
+
+
+def test_replica_pool_skips_unhealthy_replicas():
+    pool = make_pool(2)
+    pool.mark_down(pool.replicas[0])
+    for _ in range(3):
+        replica = pool.acquire()
+        assert replica is not None and replica.name == "r1"
+        pool.release(replica)
+
+    pool.mark_down(pool.replicas[1])
+    assert pool.acquire() is None, "Primary should be used when all replicas are down"
+
+
+def test_store_get_many_json():
+    store_mock = Mock(spec=Store)
+    store_mock.get_many = Mock(return_value=[b'["a", "b"]', None, '["c"]'])
+
+    assert (
+        Store.get_many_json(store_mock, ["i:1", "i:2", "i:3"], ["1", "2", "3"], "[]")
+        == b'{"1":["a", "b"],"2":[],"3":["c"]}'
+    )
+
+
+def test_store_cache_get_or_set_many():
+    store_mock = Mock(spec=Store)
+    store_mock.cache_get_or_set = Mock(side_effect=[None, b"2.0"])
+
+    assert Store.cache_get_or_set_many(
+        store_mock, ["uid:1", "uid:2"], [1.5, 3.0], [60, 70], [0.0, 5.0]
+    ) == [None, b"2.0"]
+    assert [c.args for c in store_mock.cache_get_or_set.call_args_list] == [
+        ("uid:1", 1.5, 60, 0.0),
+        ("uid:2", 3.0, 70, 5.0),
+    ]
+
+
+def test_redis_store_reads_locally_cached_values_from_primary():
+    servers = [RespServer(("localhost", 0)) for _ in range(2)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    primary, replica = servers
+    primary.keyspace.set(b"i:1", b'["new"]')
+    primary.keyspace.set(b"i:2", b'["new"]')
+    replica.keyspace.set(b"i:1", b'["stale"]')
+    replica.keyspace.set(b"i:2", b'["stale"]')
+    try:
+        store = RedisStore(
+            "localhost",
+            primary.server_address[1],
+            replicas=[("localhost", replica.server_address[1])],
+        )
+        assert store.get("i:1") == b'["stale"]', "Without local cache replica is used"
+
+        cached_store = RedisStore(
+            "localhost",
+            primary.server_address[1],
+            replicas=[("localhost", replica.server_address[1])],
+            local_cache=LocalCache(),
+        )
+        assert not store.local_cache_active
+        assert not cached_store.local_cache_active
+        # Pretend tracking is established, the stand-in doesn't support it
+        invalidator = cached_store._RedisStore__invalidator  # type: ignore
+        invalidator.stop()
+        invalidator.active = True
+        assert cached_store.local_cache_active
+        assert cached_store.get("i:1") == b'["new"]'
+        assert cached_store.get_many(["i:1", "i:2"]) == [b'["new"]', b'["new"]']
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from homework_05.tracing import (
+    NULL_SPAN,
+    ProfilerBusyError,
+    SamplingProfiler,
+    Tracer,
+    request_id_var,
+)
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    with tracer.span("stage") as span:
+        span.tag(key="value")
+    assert tracer.span("stage") is NULL_SPAN
+    assert tracer.export() == {"traceEvents": [], "displayTimeUnit": "ms"}
+
+
+def test_tracer_exports_chrome_trace_events():
+    tracer = Tracer(enabled=True)
+    token = request_id_var.set("req-1")
+    try:
+        with tracer.span("outer"):
+            with tracer.span("inner", nclients=2):
+                pass
+    finally:
+        request_id_var.reset(token)
+    with tracer.span("other"):
+        pass
+
+    events = tracer.export("req-1")["traceEvents"]
+    assert [e["name"] for e in events] == ["inner", "outer"]
+    assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+    assert events[0]["args"] == {"nclients": 2, "request_id": "req-1"}
+    assert len(tracer.export()["traceEvents"]) == 3
+
+
+def test_tracer_tags_failed_spans():
+    tracer = Tracer(enabled=True)
+    with pytest.raises(KeyError):
+        with tracer.span("failing"):
+            raise KeyError("key")
+    assert tracer.export()["traceEvents"][0]["args"]["error"] == "KeyError"
+
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler_captures_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    worker.start()
+    try:
+        stats = SamplingProfiler(interval=0.001).capture(0.1)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert stats["samples"] > 0
+    assert any(":busy_loop:" in f["function"] for f in stats["functions"])
+    assert any("busy_loop" in stack for stack in stats["stacks"])
+
+
+def test_sampling_profiler_runs_single_capture():
+    profiler = SamplingProfiler(interval=0.001)
+    errors = []
+
+    def capture():
+        try:
+            profiler.capture(0.2)
+        except ProfilerBusyError as e:
+            errors.append(e)
+
+    first = threading.Thread(target=capture)
+    first.start()
+    time.sleep(0.05)
+    capture()
+    first.join()
+    assert len(errors) == 1